@@ -0,0 +1,152 @@
+import gzip
+import os
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'image/svg+xml'
+}
+
+
+# ------------------------------------------------------------------------
+# 0. JSON Provider: orjson when installed, Flask's encoder otherwise
+# ------------------------------------------------------------------------
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Serializes jsonify / app.json.dumps output with orjson.
+    Dates, dataclasses and anything orjson does not know go through Flask's
+    default hook, so the output matches the stdlib encoder's. Values orjson
+    rejects outright (e.g. integers beyond 64 bits) fall back to the stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        data = self._orjson_dumps(obj, indent=kwargs.get('indent'))
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode()
+
+    def response(self, *args, **kwargs):
+        """Like DefaultJSONProvider.response, without the bytes -> str -> bytes round trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        data = self._orjson_dumps(obj, indent=indent)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj, indent=None):
+        if orjson is None:
+            return None
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            return None
+
+
+# ------------------------------------------------------------------------
+# 1. Flask Extension: JSON provider + negotiated response compression
+# ------------------------------------------------------------------------
+class APIResponses:
+    """
+    Installs FastJSONProvider (JSON_ENCODER='auto' uses orjson when it is
+    installed; 'stdlib' keeps Flask's) and compresses responses in
+    after_request:
+    - only buffered bodies of at least COMPRESS_MIN_SIZE bytes with a
+      compressible mimetype; streams (SSE) and send_file responses are
+      left alone,
+    - brotli when the client accepts it and the package is installed,
+      otherwise gzip,
+    - strong ETags become weak, so conditional GETs (which compare weakly)
+      keep producing 304s for the compressed body.
+    """
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JSON_ENCODER', os.getenv('JSON_ENCODER', 'auto'))
+        app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', 1024)))
+        app.config.setdefault('COMPRESS_LEVEL', int(os.getenv('COMPRESS_LEVEL', 6)))
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', int(os.getenv('COMPRESS_BROTLI_QUALITY', 4)))
+
+        kind = app.config['JSON_ENCODER']
+        if kind == 'auto':
+            app.json = FastJSONProvider(app)
+        elif kind != 'stdlib':
+            raise ValueError(f"Unknown JSON_ENCODER: {kind}")
+
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        if self.min_size >= 0:
+            app.after_request(self.compress)
+
+    def compress(self, response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.cache_control.no_transform
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate()
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.level, mtime=0)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _negotiate(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+
+api_responses = APIResponses()
+
@@ -2,13 +2,24 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_cors import CORS
 from db import db
+from queue_storage import queue_store
+from session_storage import server_sessions
+from static_assets import asset_pipeline
+from api_responses import api_responses
+from services.sync_worker import sync_worker
+from services.event_bus import event_bus
+from services.autoplay_scheduler import autoplay_scheduler
+from services.library_search import include_object
+from services.art_cache import art_cache
 import os
 
 from blueprints.main import main_bp
 from blueprints.track_controls import track_controls_bp
 from blueprints.auth import auth_bp
 from blueprints.spotify import spotify_bp
-from blueprints.queue import queue_bp
+from blueprints.queue import queue_bp, queue_service
+from blueprints.events import events_bp
+from blueprints.art import art_bp
 
 # --- Create the Flask app in global scope ---
 app = Flask(__name__)
@@ -18,10 +29,36 @@ CORS(app, supports_credentials=True)
 # Database Configuration:
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI', 'sqlite:///default.db')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_secret_key')
+# Expose the /spotify/*-stats counters without a login (e.g. to a metrics scraper):
+app.config['STATS_PUBLIC'] = os.getenv('STATS_PUBLIC', '0') in ('1', 'true', 'True')
 
 # Initializes the DB and sets Migrations:
 db.init_app(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, include_object=include_object)
+
+# Fast JSON encoding + gzip/brotli for API responses:
+api_responses.init_app(app)
+
+# Server-side sessions (the cookie only carries a session id):
+server_sessions.init_app(app)
+
+# Queue persistence backend (sql / redis / memory):
+queue_store.init_app(app)
+
+# Per-user event log behind /events (sql / memory):
+event_bus.init_app(app)
+
+# Background Spotify syncs:
+sync_worker.init_app(app)
+
+# Server-side queue advancement (shares the queue routes' registry):
+autoplay_scheduler.init_app(app, queue_service.registry)
+
+# On-disk album art cache behind /art:
+art_cache.init_app(app)
+
+# Fingerprinted, precompressed static assets (`flask assets build`):
+asset_pipeline.init_app(app)
 
 # Blueprint Registration:
 app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -29,6 +66,8 @@ app.register_blueprint(main_bp)
 app.register_blueprint(track_controls_bp)
 app.register_blueprint(spotify_bp, url_prefix='/spotify')
 app.register_blueprint(queue_bp, url_prefix='/queue')
+app.register_blueprint(events_bp, url_prefix='/events')
+app.register_blueprint(art_bp, url_prefix='/art')
 
     
 # --- Runs the app ---
@@ -0,0 +1,32 @@
+import logging
+from flask import Blueprint, request, jsonify, send_file
+from services.art_cache import art_cache, ART_ID_PATTERN
+
+art_bp = Blueprint('art', __name__)
+
+# Spotify image ids name immutable content, so every variant can be cached for a year
+ART_MAX_AGE = 365 * 24 * 3600
+
+
+@art_bp.route('/<image_id>', methods=['GET'])
+def album_art(image_id):
+    """
+    Serve a Spotify cover at ?size= pixels (rounded up to a cached variant).
+    Responses carry the blob's digest as ETag and are cacheable forever.
+    """
+    if not ART_ID_PATTERN.match(image_id):
+        return jsonify({'error': 'Unknown image id'}), 404
+    size = art_cache.size_for(request.args.get('size', 640, type=int))
+
+    try:
+        path, digest, mimetype = art_cache.get(image_id, size)
+    except LookupError:
+        return jsonify({'error': 'Image not found'}), 404
+    except Exception as e:
+        logging.warning(f"Album art error for {image_id}: {e}")
+        return jsonify({'error': 'Could not fetch image'}), 502
+
+    response = send_file(path, mimetype=mimetype, etag=digest, conditional=True, max_age=ART_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,94 @@
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from services.event_bus import event_bus
+
+events_bp = Blueprint('events', __name__)
+
+# How long one SSE connection / long-poll stays open before the client reconnects
+STREAM_MAX_SECONDS = 55
+LONG_POLL_MAX_SECONDS = 25
+# How often an idle stream sends a comment so proxies keep the connection open
+KEEP_ALIVE_SECONDS = 15
+
+
+def _since():
+    """The last event version the client saw (Last-Event-ID wins over ?since=)."""
+    try:
+        return int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        return 0
+
+
+@events_bp.route('/stream', methods=['GET'])
+def stream():
+    """
+    Server-Sent Events for queue mutations and playback changes.
+    Each event's id is its version; EventSource resends it as Last-Event-ID
+    on reconnect. A 'resync' event means the client should refetch /queue/.
+    When the process already holds EVENT_MAX_WAITERS open connections, the
+    pending events are sent at once and the client is told to reconnect later.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User not authenticated'}), 401
+    since = _since()
+    held = event_bus.waiters.acquire(blocking=False)
+
+    def generate():
+        last = since
+        deadline = time.monotonic() + (STREAM_MAX_SECONDS if held else 0)
+        yield f"retry: {2000 if held else 10000}\n\n"
+        while True:
+            timeout = max(min(KEEP_ALIVE_SECONDS, deadline - time.monotonic()), 0)
+            events, resync = event_bus.wait(user_id, last, timeout=timeout)
+            if resync:
+                events = []
+                last = event_bus.current_version(user_id)
+                yield f'id: {last}\nevent: resync\ndata: {{}}\n\n'
+            for event in events:
+                last = event['version']
+                yield f"id: {last}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            if time.monotonic() >= deadline:
+                break
+            if not events and not resync:
+                yield ': keep-alive\n\n'
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    if held:
+        # Runs when the server closes the response, even if the stream never started
+        response.call_on_close(event_bus.waiters.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@events_bp.route('/poll', methods=['GET'])
+def poll():
+    """
+    Long-poll fallback: waits up to ?timeout= seconds (max 25) for events
+    after ?since= and returns {'version', 'events', 'resync'}. Answers
+    without waiting when the process already holds EVENT_MAX_WAITERS requests.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User not authenticated'}), 401
+    try:
+        timeout = min(float(request.args.get('timeout', LONG_POLL_MAX_SECONDS)), LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'timeout must be a number'}), 400
+
+    since = _since()
+    if event_bus.waiters.acquire(blocking=False):
+        try:
+            events, resync = event_bus.wait(user_id, since, timeout=timeout)
+        finally:
+            event_bus.waiters.release()
+    else:
+        events, resync = event_bus.events_since(user_id, since)
+
+    return jsonify({
+        'version': event_bus.current_version(user_id),
+        'events': [] if resync else events,
+        'resync': resync
+    }), 200
@@ -1,22 +1,82 @@
 from flask import Blueprint, request, jsonify
 from services.queue_service import QueueService
+from queue_manager import QueueConflictError, is_track_id
 
 queue_bp = Blueprint('queue_bp', __name__)
 queue_service = QueueService()
 
+@queue_bp.errorhandler(QueueConflictError)
+def queue_conflict(e):
+    """Other workers kept changing the queue; the client can simply retry."""
+    return jsonify({'error': 'Queue changed concurrently, please retry'}), 409
+
 @queue_bp.route('/', methods=['GET'])
 def view_queue():
-    return queue_service.view_queue()
+    """Honors If-None-Match (304 when unchanged) and ?since=<version> for delta responses."""
+    since = request.args.get('since', type=int)
+    return queue_service.view_queue(since)
+
+def _bad_track(track):
+    """A track object whose id is missing or not a string (encoded strings are checked when parsed)."""
+    return not isinstance(track, (dict, str)) or (isinstance(track, dict) and not is_track_id(track.get('id')))
 
 @queue_bp.route('/add', methods=['POST'])
 def add_to_queue():
     track_info = request.get_json()
+    if _bad_track(track_info):
+        return jsonify({'error': 'track id must be a non-empty string'}), 400
     return queue_service.add_to_queue(track_info)
 
 @queue_bp.route('/remove/<track_id>', methods=['POST'])
 def remove_from_queue(track_id):
     return queue_service.remove_from_queue(track_id)
 
+# ------------------------------------------------------------------------
+# Bulk operations: one round trip each
+# ------------------------------------------------------------------------
+@queue_bp.route('/add-many', methods=['POST'])
+def add_many_to_queue():
+    """Body: {"tracks": [track, ...]}"""
+    data = request.get_json() or {}
+    tracks = data.get('tracks')
+    if not isinstance(tracks, list):
+        return jsonify({'error': 'tracks must be a list'}), 400
+    if any(_bad_track(track) for track in tracks):
+        return jsonify({'error': 'every track id must be a non-empty string'}), 400
+    return queue_service.add_many(tracks)
+
+@queue_bp.route('/remove-many', methods=['POST'])
+def remove_many_from_queue():
+    """Body: {"ids": [track_id, ...]}"""
+    data = request.get_json() or {}
+    track_ids = data.get('ids')
+    if not isinstance(track_ids, list) or not all(is_track_id(track_id) for track_id in track_ids):
+        return jsonify({'error': 'ids must be a list of non-empty strings'}), 400
+    return queue_service.remove_many(track_ids)
+
+@queue_bp.route('/move', methods=['POST'])
+def move_in_queue():
+    """Body: {"start": int, "count": int, "to": int}"""
+    data = request.get_json() or {}
+    try:
+        start, count, to = int(data['start']), int(data.get('count', 1)), int(data['to'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'start, count and to must be integers'}), 400
+    return queue_service.move_tracks(start, count, to)
+
+@queue_bp.route('/reorder', methods=['POST'])
+def reorder_queue():
+    """Body: {"ids": [track_id, ...]} listing every queued track in its new order."""
+    data = request.get_json() or {}
+    track_ids = data.get('ids')
+    if not isinstance(track_ids, list) or not all(is_track_id(track_id) for track_id in track_ids):
+        return jsonify({'error': 'ids must be a list of non-empty strings'}), 400
+    return queue_service.reorder_queue(track_ids)
+
+@queue_bp.route('/jump/<track_id>', methods=['POST'])
+def jump_to_track(track_id):
+    return queue_service.jump_to_track(track_id)
+
 
 @queue_bp.route('/clear', methods=['POST'])
 def clear_queue():
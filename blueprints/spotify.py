@@ -1,6 +1,15 @@
 # blueprints/spotify.py
-from flask import Blueprint, request, jsonify, session
-from services.spotify_service import SpotifyService
+import logging
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify, session, current_app
+from services.spotify_service import SpotifyService, LIBRARY_PAGE_SIZE, LIBRARY_MAX_PAGE_SIZE
+from services.sync_worker import sync_worker
+from services.autoplay_scheduler import autoplay_scheduler
+from services.response_cache import response_cache
+from services.search_cache import search_cache
+from services.rate_limiter import rate_limiter, single_flight
+from services.token_manager import token_manager
 
 
 spotify_bp = Blueprint('spotify', __name__)
@@ -13,89 +22,163 @@ spotify_service = SpotifyService()
 
 @spotify_bp.route('/search', methods=['GET'])
 def search_spotify():
-    """Search for tracks, artists, etc. on Spotify via the SpotifyService."""
+    """
+    Search for tracks, artists, etc. on Spotify via the SpotifyService.
+    ?scope=library searches the user's own liked/recent tracks locally instead.
+    """
     query = request.args.get('query', '')
     search_type = request.args.get('type', 'track')
-    print(f"Frontend Query: {query}, Type: {search_type}")  # Debugging
+    scope = request.args.get('scope', 'catalog')
+    logging.debug(f"Frontend Query: {query}, Type: {search_type}, Scope: {scope}")
     if not query:
         return jsonify({'error': 'Query parameter is required'}), 400
+    if scope == 'library':
+        return spotify_service.search_library(query, search_type)
     return spotify_service.search(query, search_type)
 
 @spotify_bp.route('/transfer-playback', methods=['PUT'])
 def transfer_playback():
-    """Transfer Spotify playback to a given device (and start playing)."""
+    """
+    Transfer Spotify playback to a given device (and start playing).
+    With "song_id" the transfer and the play are a single upstream call.
+    """
     data = request.get_json() or {}
-    return spotify_service.transfer_playback(data)
+    response, status_code = spotify_service.transfer_playback(data)
+    user_id = session.get('user_id')
+    if user_id and status_code == 200 and data.get('song_id'):
+        access_token = token_manager.for_session()
+        autoplay_scheduler.watch(user_id, access_token, data['song_id'], int(data.get('timestamp', 0)))
+    elif user_id:
+        autoplay_scheduler.poke(user_id)
+    return response, status_code
 
 @spotify_bp.route('/play', methods=['PUT'])
 def play_song():
-    """Start or resume playback of a specific track."""
+    """
+    Start or resume playback of a specific track; tracks in the server queue
+    are then advanced server-side. X-Autoplay: 1 tells the browser the
+    scheduler is following this track, 0 that it must advance by itself.
+    """
     data = request.get_json() or {}
     if 'song_id' not in data:
         return jsonify({'error': 'song_id is required'}), 400
-    return spotify_service.play_song(data)
+    response, status_code = spotify_service.play_song(data)
+    user_id = session.get('user_id')
+    if user_id and status_code == 200:
+        access_token = token_manager.for_session()
+        autoplay_scheduler.watch(user_id, access_token, data['song_id'], int(data.get('timestamp', 0)))
+        response.headers['X-Autoplay'] = '1' if autoplay_scheduler.is_watching(user_id) else '0'
+    return response, status_code
 
 @spotify_bp.route('/pause', methods=['PUT'])
 def pause_song():
     """Pause the current Spotify playback."""
-    return spotify_service.pause_song()
+    result = spotify_service.pause_song()
+    if session.get('user_id'):
+        autoplay_scheduler.paused(session['user_id'])
+    return result
 
 @spotify_bp.route('/next', methods=['PUT'])
 def next_song():
     """Skip to the next track in Spotify playback."""
-    return spotify_service.next_song()
+    result = spotify_service.next_song()
+    if session.get('user_id'):
+        autoplay_scheduler.poke(session['user_id'])
+    return result
 
 @spotify_bp.route('/prev', methods=['PUT'])
 def previous_song():
     """Go back to the previous track in Spotify playback."""
-    return spotify_service.previous_song()
+    result = spotify_service.previous_song()
+    if session.get('user_id'):
+        autoplay_scheduler.poke(session['user_id'])
+    return result
 
 
 # ------------------------------------------------------------------------
-# 2. Direct "Recently Played" (from Spotify) vs. Local
-#    (If you still want direct remote fetch, keep it. Otherwise, you can remove.)
+# 2. Local Library: answered from the DB, synced in the background
 # ------------------------------------------------------------------------
-@spotify_bp.route('/recent-tracks', methods=['GET'])
-def get_recent_tracks():
+def _local_library_response(user_id, kind, fetch):
     """
-    Sync recent tracks from Spotify to the local database,
-    then fetch and return them for the authenticated user.
+    Serve the user's local `kind` rows straight from the DB: all of them by
+    default, or one page when ?limit= or ?cursor= is given (?cursor=
+    continues from X-Next-Cursor).
+    A background sync is queued when the data is stale; only the very first
+    sync (nothing local yet) is waited on, up to SYNC_FIRST_WAIT seconds.
+    X-Last-Synced carries the last successful sync time (ISO-8601 UTC).
     """
+    access_token = token_manager.for_session()
+    last_synced = spotify_service.last_synced(user_id, kind)
+    stale_after = timedelta(seconds=current_app.config['SYNC_STALE_AFTER'])
+
+    if access_token and (last_synced is None or datetime.now(timezone.utc).replace(tzinfo=None) - last_synced > stale_after):
+        job = sync_worker.request_sync(user_id, kind, access_token)
+        if last_synced is None:
+            try:
+                result, status_code = job.result(timeout=current_app.config['SYNC_FIRST_WAIT'])
+                if status_code != 200:
+                    return jsonify(result), status_code
+            except FuturesTimeout:
+                pass
+            last_synced = spotify_service.last_synced(user_id, kind)
+
+    try:
+        limit = None
+        if 'limit' in request.args or 'cursor' in request.args:
+            limit = min(int(request.args.get('limit', LIBRARY_PAGE_SIZE)), LIBRARY_MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError
+        tracks, next_cursor = fetch(user_id, limit=limit, cursor=request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    response = jsonify(tracks)
+    response.headers['X-Next-Cursor'] = next_cursor or ''
+    response.headers['X-Last-Synced'] = f'{last_synced.isoformat()}Z' if last_synced else ''
+    response.headers['X-Sync-In-Progress'] = 'true' if sync_worker.is_running(user_id, kind) else 'false'
+    return response, 200
+
+
+@spotify_bp.route('/recent-tracks', methods=['GET'])
+def get_recent_tracks():
+    """Return the authenticated user's recently played tracks from the local database."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({'error': 'User not authenticated'}), 401
-
-    # Sync data from Spotify to the local database
-    sync_result = spotify_service.sync_recent_tracks_from_spotify()
-    if sync_result[1] != 200:  # Check if sync was unsuccessful
-        return sync_result  # Return error response from sync
-
-    # Fetch synced data from the local database
-    recent_tracks = spotify_service.fetch_recent_tracks(user_id)
-    return jsonify(recent_tracks), 200
+    return _local_library_response(user_id, 'recent', spotify_service.fetch_recent_tracks)
 
 
 # ------------------------------------------------------------------------
-# 3. Liked Tracks: Sync from Spotify -> Local, then fetch from Local
+# 3. Liked Tracks: served from Local, synced from Spotify in the background
 # ------------------------------------------------------------------------
 @spotify_bp.route('/liked-tracks', methods=['GET'])
 def get_liked_tracks():
+    """Return the authenticated user's liked tracks from the local database."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User not authenticated'}), 401
+    return _local_library_response(user_id, 'liked', spotify_service.fetch_liked_tracks)
+
+
+@spotify_bp.route('/sync', methods=['POST'])
+def request_sync():
     """
-    Sync liked tracks from Spotify to the local database,
-    then fetch and return them for the authenticated user.
+    Queue background syncs on demand, e.g. {"kinds": ["liked", "recent"]}.
+    Returns 202 immediately; duplicate requests join the running job.
     """
     user_id = session.get('user_id')
-    if not user_id:
+    access_token = token_manager.for_session()
+    if not user_id or not access_token:
         return jsonify({'error': 'User not authenticated'}), 401
 
-    # Sync data from Spotify to the local database
-    sync_result = spotify_service.sync_liked_tracks_from_spotify()
-    if sync_result[1] != 200:  # Check if sync was unsuccessful
-        return sync_result  # Return error response from sync
+    data = request.get_json(silent=True) or {}
+    kinds = data.get('kinds', list(sync_worker.KINDS))
+    if not isinstance(kinds, list) or any(kind not in sync_worker.KINDS for kind in kinds):
+        return jsonify({'error': f'kinds must be a subset of {list(sync_worker.KINDS)}'}), 400
 
-    # Fetch synced data from the local database
-    liked_tracks = spotify_service.fetch_liked_tracks(user_id)
-    return jsonify(liked_tracks), 200
+    for kind in kinds:
+        sync_worker.request_sync(user_id, kind, access_token)
+    return jsonify({'message': 'Sync queued', 'kinds': kinds}), 202
 
 
 # ------------------------------------------------------------------------
@@ -140,6 +223,20 @@ def unlike_track():
         return jsonify({'error': 'An error occurred while unliking the track'}), 500
 
 
+@spotify_bp.route('/like-batch', methods=['POST'])
+def like_batch():
+    """
+    Flush queued like/unlike toggles in one request:
+    {"ops": [{"id": "...", "liked": true, "track": {...}}, {"id": "...", "liked": false}]}
+    """
+    data = request.get_json(silent=True) or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list):
+        return jsonify({'error': 'ops must be a list'}), 400
+    response, status_code = spotify_service.apply_like_batch(ops)
+    return jsonify(response), status_code
+
+
 # ------------------------------------------------------------------------
 # 5. Get Specific Track(s)
 # ------------------------------------------------------------------------
@@ -158,3 +255,31 @@ def track_details_batch():
     if not track_ids:
         return jsonify({'error': 'trackIds parameter is required'}), 400
     return spotify_service.get_multiple_tracks(track_ids.split(','))
+
+
+# ------------------------------------------------------------------------
+# 6. Catalog Cache Stats (logged-in users only, unless STATS_PUBLIC is set)
+# ------------------------------------------------------------------------
+def _stats_allowed():
+    return bool(session.get('user_id')) or current_app.config['STATS_PUBLIC']
+
+@spotify_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and size of the catalog response cache."""
+    if not _stats_allowed():
+        return jsonify({'error': 'User not authenticated'}), 401
+    return jsonify(response_cache.stats()), 200
+
+@spotify_bp.route('/search-stats', methods=['GET'])
+def search_stats():
+    """Exact / prefix hit counters of the typeahead search cache."""
+    if not _stats_allowed():
+        return jsonify({'error': 'User not authenticated'}), 401
+    return jsonify(search_cache.stats()), 200
+
+@spotify_bp.route('/rate-stats', methods=['GET'])
+def rate_stats():
+    """State of the upstream rate limiter and how many GETs were coalesced."""
+    if not _stats_allowed():
+        return jsonify({'error': 'User not authenticated'}), 401
+    return jsonify(dict(rate_limiter.stats(), coalesced=single_flight.coalesced)), 200
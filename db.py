@@ -1,6 +1,43 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
 # ------------------------------------------------------------------------
 # 0. Instantiates SQLAlchemy:
 # ------------------------------------------------------------------------
 db = SQLAlchemy()
+
+
+# ------------------------------------------------------------------------
+# 1. Dialect Helpers:
+# ------------------------------------------------------------------------
+def dialect_insert(model):
+    """
+    Return an INSERT for `model` that supports ON CONFLICT on the current
+    backend (SQLite / Postgres), or None when the dialect has no such clause.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    return None
+
+
+def insert_ignore(model, rows, index_elements):
+    """
+    Insert `rows` in one statement, skipping rows that collide on
+    `index_elements`. Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    stmt = dialect_insert(model)
+    if stmt is None:
+        inserted = 0
+        for row in rows:
+            key = {column: row[column] for column in index_elements}
+            if not db.session.query(model).filter_by(**key).first():
+                db.session.add(model(**row))
+                inserted += 1
+        return inserted
+    result = db.session.execute(stmt.values(rows).on_conflict_do_nothing(index_elements=index_elements))
+    return result.rowcount
@@ -0,0 +1,147 @@
+"""library search index
+
+Revision ID: 488c1388e6fb
+Revises: a46ad9e99680
+Create Date: 2026-10-17 12:31:02.011854
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '488c1388e6fb'
+down_revision = 'a46ad9e99680'
+branch_labels = None
+depends_on = None
+
+
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(artist, '') || ' ' || coalesce(album, ''))"
+)
+
+# SQLite: one document per (user, source, track), indexed by an external-content FTS5 table.
+# NOTE: a batch-mode rebuild of liked_songs / recently_played drops their triggers;
+# recreate them (SQLITE_SOURCE_TRIGGERS) in any migration that rebuilds those tables.
+SQLITE_TABLES = [
+    """
+    CREATE TABLE library_search_docs (
+        id INTEGER PRIMARY KEY,
+        owner TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        track_id TEXT NOT NULL,
+        name TEXT,
+        artist TEXT,
+        album TEXT,
+        UNIQUE (user_id, source, track_id)
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE library_fts USING fts5(
+        owner, name, artist, album,
+        content='library_search_docs', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER library_search_docs_ai AFTER INSERT ON library_search_docs BEGIN
+        INSERT INTO library_fts(rowid, owner, name, artist, album)
+        VALUES (new.id, new.owner, new.name, new.artist, new.album);
+    END
+    """,
+    """
+    CREATE TRIGGER library_search_docs_ad AFTER DELETE ON library_search_docs BEGIN
+        INSERT INTO library_fts(library_fts, rowid, owner, name, artist, album)
+        VALUES ('delete', old.id, old.owner, old.name, old.artist, old.album);
+    END
+    """,
+    """
+    CREATE TRIGGER library_search_docs_au AFTER UPDATE ON library_search_docs BEGIN
+        INSERT INTO library_fts(library_fts, rowid, owner, name, artist, album)
+        VALUES ('delete', old.id, old.owner, old.name, old.artist, old.album);
+        INSERT INTO library_fts(rowid, owner, name, artist, album)
+        VALUES (new.id, new.owner, new.name, new.artist, new.album);
+    END
+    """,
+]
+
+SQLITE_SOURCE_TRIGGERS = [
+    """
+    CREATE TRIGGER liked_songs_search_ai AFTER INSERT ON liked_songs BEGIN
+        INSERT OR IGNORE INTO library_search_docs(owner, user_id, source, track_id, name, artist, album)
+        VALUES ('u' || new.user_id, new.user_id, 'liked', new.id, new.name, new.artist, new.album);
+    END
+    """,
+    """
+    CREATE TRIGGER liked_songs_search_ad AFTER DELETE ON liked_songs BEGIN
+        DELETE FROM library_search_docs
+        WHERE user_id = old.user_id AND source = 'liked' AND track_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER liked_songs_search_au AFTER UPDATE OF name, artist, album ON liked_songs BEGIN
+        UPDATE library_search_docs SET name = new.name, artist = new.artist, album = new.album
+        WHERE user_id = old.user_id AND source = 'liked' AND track_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER recently_played_search_ai AFTER INSERT ON recently_played BEGIN
+        INSERT OR IGNORE INTO library_search_docs(owner, user_id, source, track_id, name, artist, album)
+        VALUES ('u' || new.user_id, new.user_id, 'recent', new.id, new.name, new.artist, new.album);
+    END
+    """,
+    """
+    CREATE TRIGGER recently_played_search_ad AFTER DELETE ON recently_played BEGIN
+        DELETE FROM library_search_docs
+        WHERE user_id = old.user_id AND source = 'recent' AND track_id = old.id
+          AND NOT EXISTS (SELECT 1 FROM recently_played WHERE user_id = old.user_id AND id = old.id);
+    END
+    """,
+]
+
+SQLITE_BACKFILL = [
+    """
+    INSERT OR IGNORE INTO library_search_docs(owner, user_id, source, track_id, name, artist, album)
+    SELECT 'u' || user_id, user_id, 'liked', id, name, artist, album FROM liked_songs
+    """,
+    """
+    INSERT OR IGNORE INTO library_search_docs(owner, user_id, source, track_id, name, artist, album)
+    SELECT 'u' || user_id, user_id, 'recent', id, name, artist, album FROM recently_played
+    """,
+]
+
+
+def _sqlite_has_fts5(bind):
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        bind.exec_driver_sql("DROP TABLE temp.fts5_probe")
+        return True
+    except sa.exc.OperationalError:
+        return False
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # Without FTS5 the app falls back to its in-process trigram index
+        if not _sqlite_has_fts5(bind):
+            return
+        for statement in SQLITE_TABLES + SQLITE_SOURCE_TRIGGERS + SQLITE_BACKFILL:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        op.create_index('ix_liked_songs_search', 'liked_songs', [sa.text(PG_SEARCH_VECTOR)], postgresql_using='gin')
+        op.create_index('ix_recently_played_search', 'recently_played', [sa.text(PG_SEARCH_VECTOR)], postgresql_using='gin')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('liked_songs_search_ai', 'liked_songs_search_ad', 'liked_songs_search_au',
+                        'recently_played_search_ai', 'recently_played_search_ad'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS library_fts")
+        op.execute("DROP TABLE IF EXISTS library_search_docs")
+    elif bind.dialect.name == 'postgresql':
+        op.drop_index('ix_recently_played_search', table_name='recently_played')
+        op.drop_index('ix_liked_songs_search', table_name='liked_songs')
@@ -0,0 +1,91 @@
+"""key recently_played by user and played_at
+
+Revision ID: ed89f1bb1d0e
+Revises: c1b10c3cf46c
+Create Date: 2026-10-17 12:17:11.723353
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ed89f1bb1d0e'
+down_revision = 'c1b10c3cf46c'
+branch_labels = None
+depends_on = None
+
+# Base of the synthetic play times given to rows copied from the old table
+LEGACY_PLAYED_AT = datetime(1970, 1, 1)
+
+
+def upgrade():
+    # Rows from before this revision have no play time. They are copied with
+    # synthetic played_at values counting up from the epoch: they stay in their
+    # original order, sort before any real play, and cannot collide with the
+    # plays the next sync fetches.
+    with op.batch_alter_table('recently_played', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recently_played_user_id'))
+    op.rename_table('recently_played', '_recently_played_old')
+
+    recently_played = op.create_table('recently_played',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('played_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('artist', sa.String(length=100), nullable=False),
+    sa.Column('album', sa.String(length=100), nullable=False),
+    sa.Column('albumArt', sa.String(length=100), nullable=True),
+    sa.Column('uri', sa.String(length=100), nullable=False),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'played_at')
+    )
+
+    rows = op.get_bind().execute(sa.text(
+        'SELECT user_id, id, name, artist, album, "albumArt", uri, duration_ms FROM _recently_played_old'
+    )).mappings().all()
+    counts = {}
+    copied = []
+    for row in rows:
+        n = counts.get(row['user_id'], 0)
+        counts[row['user_id']] = n + 1
+        copied.append(dict(row, played_at=LEGACY_PLAYED_AT + timedelta(seconds=n)))
+    if copied:
+        op.bulk_insert(recently_played, copied)
+    op.drop_table('_recently_played_old')
+
+
+def downgrade():
+    # The old table is keyed on the track id alone: keep each track's latest play
+    op.rename_table('recently_played', '_recently_played_new')
+
+    recently_played = op.create_table('recently_played',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('artist', sa.String(length=100), nullable=False),
+    sa.Column('album', sa.String(length=100), nullable=False),
+    sa.Column('albumArt', sa.String(length=100), nullable=True),
+    sa.Column('uri', sa.String(length=100), nullable=False),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    rows = op.get_bind().execute(sa.text(
+        'SELECT user_id, id, name, artist, album, "albumArt", uri, duration_ms FROM _recently_played_new '
+        'ORDER BY played_at DESC'
+    )).mappings().all()
+    latest = {}
+    for row in rows:
+        latest.setdefault(row['id'], dict(row))
+    if latest:
+        op.bulk_insert(recently_played, list(latest.values()))
+    op.drop_table('_recently_played_new')
+
+    with op.batch_alter_table('recently_played', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recently_played_user_id'), ['user_id'], unique=False)
+    op.execute("DELETE FROM sync_cursors WHERE kind = 'recent'")
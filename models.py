@@ -39,8 +39,10 @@ class User(BaseModel):
             'username': self.username,
             'email': self.email,
             'spotify_id': self.spotify_id,
-            'liked_songs': [song.to_dict() for song in self.liked_songs],
-            'recent_songs': [song.to_dict() for song in self.recent_songs]
+            # Libraries can hold thousands of rows; page them via /spotify/liked-tracks
+            # and /spotify/recent-tracks instead of serializing them here.
+            'liked_count': self.liked_songs.count(),
+            'recent_count': self.recent_songs.count()
         }
 
     @classmethod
@@ -55,17 +57,26 @@ class User(BaseModel):
 # 2. Like Model:
 # ------------------------------------------------------------------------
 class Like(BaseModel):
+    """A track liked by a user; keyed by (user_id, id) so any number of users can like it."""
     __tablename__ = 'liked_songs'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('user_id', 'id', name='pk_liked_songs'),
+        db.Index('ix_liked_songs_user_added_at', 'user_id', 'added_at'),
+        db.Index('ix_liked_songs_user_name_artist_album', 'user_id', 'name', 'artist', 'album'),
+    )
 
-    id = db.Column(db.String, primary_key=True)
+    id = db.Column(db.String, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     artist = db.Column(db.String(100), nullable=False)
     album = db.Column(db.String(100), nullable=False)
     albumArt = db.Column(db.String(100), nullable=True)
     uri = db.Column(db.String(100), nullable=False)
     duration_ms = db.Column(db.Integer, nullable=True)
+    added_at = db.Column(db.DateTime, nullable=True)
+    # False while an in-app like has not been confirmed on Spotify yet; syncs never delete those
+    mirrored = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     user = relationship('User', back_populates='liked_songs')
 
     def to_dict(self):
@@ -77,6 +88,7 @@ class Like(BaseModel):
             'albumArt': self.albumArt,
             'uri' : self.uri,
             'duration_ms': self.duration_ms,
+            'added_at': self.added_at.isoformat() if self.added_at else None,
             'user_id': self.user_id
         }
 
@@ -88,9 +100,15 @@ class Like(BaseModel):
 # 3. Recent Model:
 # ------------------------------------------------------------------------
 class Recent(BaseModel):
+    """One row per play: keyed by (user_id, played_at); `id` is the Spotify track id."""
     __tablename__ = 'recently_played'
+    __table_args__ = (
+        db.Index('ix_recently_played_user_track', 'user_id', 'id'),
+    )
 
-    id = db.Column(db.String, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    played_at = db.Column(db.DateTime, primary_key=True)
+    id = db.Column(db.String, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     artist = db.Column(db.String(100), nullable=False)
     album = db.Column(db.String(100), nullable=False)
@@ -98,7 +116,6 @@ class Recent(BaseModel):
     uri = db.Column(db.String(100), nullable=False)
     duration_ms = db.Column(db.Integer, nullable=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     user = relationship('User', back_populates='recent_songs')
 
     def to_dict(self):
@@ -110,8 +127,111 @@ class Recent(BaseModel):
             'albumArt': self.albumArt,
             'uri': self.uri,
             'duration_ms': self.duration_ms,
+            'played_at': self.played_at.isoformat() if self.played_at else None,
             'user_id': self.user_id
         }
 
     def __repr__(self):
         return f"<Recent {self.name} by {self.artist}>"
+
+
+# ------------------------------------------------------------------------
+# 4. QueueState Model:
+# ------------------------------------------------------------------------
+class QueueState(BaseModel):
+    __tablename__ = 'queue_states'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    tracks = db.Column(db.JSON, nullable=False, default=list)
+    current_index = db.Column(db.Integer, nullable=False, default=-1)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    ops = db.Column(db.JSON, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'queue': self.tracks,
+            'current_index': self.current_index,
+            'version': self.version,
+            'ops': self.ops or []
+        }
+
+    def __repr__(self):
+        return f"<QueueState user={self.user_id} v{self.version}>"
+
+
+# ------------------------------------------------------------------------
+# 5. SyncCursor Model:
+# ------------------------------------------------------------------------
+class SyncCursor(BaseModel):
+    """Per-user progress marker for incremental Spotify syncs ('liked', 'recent')."""
+    __tablename__ = 'sync_cursors'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    cursor = db.Column(db.String(64), nullable=True)
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'cursor': self.cursor,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None
+        }
+
+    def __repr__(self):
+        return f"<SyncCursor {self.kind} user={self.user_id}>"
+
+
+# ------------------------------------------------------------------------
+# 6. OAuthToken Model:
+# ------------------------------------------------------------------------
+class OAuthToken(BaseModel):
+    """The user's current Spotify tokens, shared by every worker and background job."""
+    __tablename__ = 'oauth_tokens'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    access_token = db.Column(db.Text, nullable=False)
+    refresh_token = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    scope = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<OAuthToken user={self.user_id} expires={self.expires_at}>"
+
+
+# ------------------------------------------------------------------------
+# 7. ServerSession Model:
+# ------------------------------------------------------------------------
+class ServerSession(BaseModel):
+    """Server-side Flask session data; the cookie only carries `sid`."""
+    __tablename__ = 'server_sessions'
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ServerSession expires={self.expires_at}>"
+
+
+# ------------------------------------------------------------------------
+# 8. UserEvent Model:
+# ------------------------------------------------------------------------
+class UserEvent(BaseModel):
+    """One entry in a user's event sequence (services/event_bus.py); only the latest few are kept."""
+    __tablename__ = 'user_events'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    type = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+    ts = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {'version': self.version, 'type': self.type, 'data': self.data, 'ts': self.ts}
+
+    def __repr__(self):
+        return f"<UserEvent user={self.user_id} v{self.version} {self.type}>"
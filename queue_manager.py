@@ -1,88 +1,235 @@
 import logging
 import json
+import threading
+import time
 import urllib.parse
+from collections import deque
+from dataclasses import dataclass
+
+from queue_storage import queue_store
+
+# Number of recent mutations each queue keeps for delta responses
+OP_LOG_SIZE = 100
+
+
+def is_track_id(value):
+    """Track ids key the queue's position index, so only non-empty strings are accepted."""
+    return isinstance(value, str) and bool(value)
+
+
+# ------------------------------------------------------------------------
+# 0. Queued Track Record:
+# ------------------------------------------------------------------------
+@dataclass(slots=True)
+class TrackRecord:
+    """The only fields the queue keeps for a track."""
+    id: str
+    uri: str = ''
+    name: str = ''
+    artist: str = ''
+    album: str = ''
+    albumArt: str = ''
+    duration_ms: int = 0
+
+    @classmethod
+    def from_raw(cls, raw):
+        """
+        Build a record from whatever the front end sent:
+        - a URL-encoded JSON string (the queue buttons' data-track attribute),
+        - a dict in our own shape (artist / album / albumArt),
+        - a search-result shape (artistNames / albumName / albumArtUrl),
+        - a full Spotify track object (artists list / album dict).
+        Returns None when there is no track id, or it is not a non-empty string.
+        """
+        if isinstance(raw, cls):
+            return raw
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(urllib.parse.unquote(raw))
+            except (json.JSONDecodeError, ValueError):
+                return None
+        if not isinstance(raw, dict) or not is_track_id(raw.get('id')):
+            return None
+
+        album = raw.get('album')
+        if isinstance(album, dict):
+            images = album.get('images') or [{}]
+            album_name = album.get('name', '')
+            album_art = images[0].get('url', '')
+        else:
+            album_name = album or raw.get('albumName', '')
+            album_art = raw.get('albumArt') or raw.get('albumArtUrl', '')
+
+        artist = raw.get('artist') or raw.get('artistNames')
+        if not artist and raw.get('artists'):
+            artist = ', '.join(a.get('name', '') for a in raw['artists'])
+
+        return cls(
+            id=raw['id'],
+            uri=raw.get('uri') or f"spotify:track:{raw['id']}",
+            name=raw.get('name', ''),
+            artist=artist or '',
+            album=album_name,
+            albumArt=album_art,
+            duration_ms=raw.get('duration_ms') or 0
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'uri': self.uri,
+            'name': self.name,
+            'artist': self.artist,
+            'album': self.album,
+            'albumArt': self.albumArt,
+            'duration_ms': self.duration_ms
+        }
+
 
 # ------------------------------------------------------------------------
-# 0. Server Queue Management System:
+# 1. Server Queue Management System:
 # ------------------------------------------------------------------------
 class QueueManager:
     def __init__(self):
-        self.queue = []
+        self.queue = []  # list of TrackRecord
         self.current_index = -1
+        self.version = 0
+        # Recent mutations as {'version', 'op', ...}, so clients can catch up with deltas
+        self.ops = deque(maxlen=OP_LOG_SIZE)
+        self.lock = threading.RLock()
+        # Track id -> position in self.queue, kept in step with every mutation
+        self._positions = {}
 
     def set_queue(self, tracks):
-        """Replace the entire queue with `tracks` (list of dicts or strings)."""
-        self.queue = tracks
-        self.current_index = 0 if tracks else -1
-        
+        """Replace the entire queue with `tracks` (list of dicts or JSON strings)."""
+        self.queue = []
+        self._positions = {}
+        added = self._append(self._parse_tracks(tracks))
+        self.current_index = 0 if self.queue else -1
+        self._record('set', tracks=[track.to_dict() for track in added])
+
     def add_to_queue(self, tracks):
         """
         Add `tracks` to the current queue.
-        - If front end sends raw JSON as a dict, we store it directly.
-        - If front end sends URL-encoded JSON strings, we decode + parse each one.
+        Each track is parsed once into a TrackRecord (see TrackRecord.from_raw);
+        tracks already in the queue are skipped. Returns the records added.
         """
-        parsed_tracks = []
-        for t in tracks:
-            # If it's already a dict, just add it
-            if isinstance(t, dict):
-                parsed_tracks.append(t)
-            elif isinstance(t, str):
-                try:
-                    # Step 1: URL-decode the string
-                    decoded_str = urllib.parse.unquote(t)
-                    # Step 2: parse JSON
-                    track_dict = json.loads(decoded_str)
-                    parsed_tracks.append(track_dict)
-                except (json.JSONDecodeError, ValueError):
-                    logging.error(f"Could not parse track string: {t}")
-            else:
-                # Edge-case:
-                parsed_tracks.append(t)
-
-        self.queue.extend(parsed_tracks)
+        added = self._append(self._parse_tracks(tracks))
 
         # If queue was empty before, set current_index to 0
         if self.current_index == -1 and self.queue:
             self.current_index = 0
+        # All duplicates: nothing changed, so no new version to save or announce
+        if added:
+            self._record('add', tracks=[track.to_dict() for track in added])
+        return added
 
     def remove_from_queue(self, track_id: str) -> bool:
         """
-        Remove a track with matching 'id' from the queue.
-        If the track is stored as a dict, compare track['id'] directly.
-        If the track is stored as a URL-encoded JSON string, decode + parse first.
+        Remove the track with matching 'id' from the queue.
+        O(n) in the tracks after it (list delete + reindex), deliberately: every
+        saved mutation already serializes the whole snapshot, which costs far more.
         """
-        initial_length = len(self.queue)
-        new_queue = []
-
-        for track in self.queue:
-            if isinstance(track, str):
-                try:
-                    decoded_str = urllib.parse.unquote(track)
-                    track = json.loads(decoded_str)
-                except (json.JSONDecodeError, ValueError) as e:
-                    # Skips invalid track
-                    continue
-
-            # Only keep the track if its 'id' doesn't match
-            if track.get('id') != track_id:
-                new_queue.append(track)
-
-        self.queue = new_queue
-
-        # If something was removed, adjust current_index
-        if len(self.queue) < initial_length:
-            if self.current_index >= len(self.queue):
-                self.current_index = len(self.queue) - 1
-            if not self.queue:
-                self.current_index = -1
-            return True
-        else:
+        position = self._positions.pop(track_id, None)
+        if position is None:
             return False
 
+        del self.queue[position]
+        self._reindex(position)
+
+        # Keep current_index pointing at the same track where possible
+        if position < self.current_index:
+            self.current_index -= 1
+        if self.current_index >= len(self.queue):
+            self.current_index = len(self.queue) - 1
+        self._record('remove', ids=[track_id])
+        return True
+
+    def remove_many(self, track_ids):
+        """Remove every track whose id is in `track_ids` in one pass; returns the count removed."""
+        doomed = {track_id for track_id in track_ids if track_id in self._positions}
+        if not doomed:
+            return 0
+
+        current = self.queue[self.current_index] if self.current_index >= 0 else None
+        removed_before_current = 0
+        kept = []
+        for position, track in enumerate(self.queue):
+            if track.id in doomed:
+                if position < self.current_index:
+                    removed_before_current += 1
+                continue
+            kept.append(track)
+
+        self.queue = kept
+        self._positions = {}
+        self._reindex()
+
+        if current is not None and current.id not in doomed:
+            self.current_index = self._positions[current.id]
+        else:
+            self.current_index = min(self.current_index - removed_before_current, len(self.queue) - 1)
+        if not self.queue:
+            self.current_index = -1
+        self._record('remove', ids=sorted(doomed))
+        return len(doomed)
+
+    def move(self, start, count, to):
+        """
+        Move the `count` tracks starting at `start` so the block begins at
+        position `to` (counted after the block is taken out). The current
+        track stays current wherever it ends up.
+        """
+        if count <= 0 or start < 0 or start + count > len(self.queue):
+            raise ValueError('Range is outside the queue.')
+        if to < 0 or to > len(self.queue) - count:
+            raise ValueError('Target position is outside the queue.')
+
+        current = self.queue[self.current_index] if self.current_index >= 0 else None
+        block = self.queue[start:start + count]
+        rest = self.queue[:start] + self.queue[start + count:]
+        self.queue = rest[:to] + block + rest[to:]
+        self._reindex(min(start, to))
+
+        if current is not None:
+            self.current_index = self._positions[current.id]
+        self._record('move', start=start, count=count, to=to)
+
+    def reorder(self, track_ids):
+        """Replace the queue order with `track_ids`, which must list every queued id exactly once."""
+        if len(track_ids) != len(self.queue) or set(track_ids) != self._positions.keys():
+            raise ValueError('Reorder must list every queued track exactly once.')
+
+        current = self.queue[self.current_index] if self.current_index >= 0 else None
+        self.queue = [self.queue[self._positions[track_id]] for track_id in track_ids]
+        self._reindex()
+
+        if current is not None:
+            self.current_index = self._positions[current.id]
+        self._record('reorder', ids=list(track_ids))
+
+    def contains(self, track_id):
+        """Return True if a track with `track_id` is queued."""
+        return track_id in self._positions
+
+    def position_of(self, track_id):
+        """Return the queue position of `track_id`, or None."""
+        return self._positions.get(track_id)
+
+    def jump_to(self, track_id):
+        """Make the track with `track_id` current and return it."""
+        position = self._positions.get(track_id)
+        if position is None:
+            return None
+        self.current_index = position
+        self._record('index')
+        return self.queue[position]
+
     def next_track(self):
         """Advance to the next track in the queue (if any) and return it."""
         if self.current_index + 1 < len(self.queue):
             self.current_index += 1
+            self._record('index')
             return self.queue[self.current_index]
         else:
             return None
@@ -91,15 +238,165 @@ class QueueManager:
         """Go back to the previous track (if any) and return it."""
         if self.current_index > 0:
             self.current_index -= 1
+            self._record('index')
             return self.queue[self.current_index]
         else:
             return None
 
     def get_queue(self):
-        """Return the entire current queue."""
-        return self.queue
+        """Return the entire current queue as plain dicts."""
+        return [track.to_dict() for track in self.queue]
 
     def clear_queue(self):
         """Clear out the entire queue."""
         self.queue = []
+        self._positions = {}
         self.current_index = -1
+        self._record('clear')
+
+    def ops_since(self, version):
+        """
+        Return the ops applied after `version`, oldest first, or None when the
+        log no longer reaches back that far (the client needs a full snapshot).
+        """
+        if version == self.version:
+            return []
+        if version > self.version or not self.ops or self.ops[0]['version'] > version + 1:
+            return None
+        return [op for op in self.ops if op['version'] > version]
+
+    def to_state(self):
+        """Return a plain-dict snapshot suitable for a queue store."""
+        return {
+            'queue': [track.to_dict() for track in self.queue],
+            'current_index': self.current_index,
+            'version': self.version,
+            'ops': list(self.ops)
+        }
+
+    def load_state(self, state):
+        """Replace this queue's contents with a snapshot from `to_state`."""
+        self.queue = []
+        self._positions = {}
+        self._append(self._parse_tracks(state.get('queue', [])))
+        self.current_index = state.get('current_index', -1)
+        self.version = state.get('version', 0)
+        self.ops = deque(state.get('ops', []), maxlen=OP_LOG_SIZE)
+
+    # ------------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------------
+    def _parse_tracks(self, tracks):
+        """Parse incoming tracks into TrackRecords, dropping anything unusable."""
+        parsed_tracks = []
+        for t in tracks:
+            record = TrackRecord.from_raw(t)
+            if record is None:
+                logging.error(f"Could not parse track: {t}")
+                continue
+            parsed_tracks.append(record)
+        return parsed_tracks
+
+    def _append(self, tracks):
+        """Append records to the queue, indexing by id and skipping duplicates; returns those added."""
+        added = []
+        for track in tracks:
+            if track.id in self._positions:
+                continue
+            self._positions[track.id] = len(self.queue)
+            self.queue.append(track)
+            added.append(track)
+        return added
+
+    def _record(self, op, **details):
+        """Bump the version and log the mutation with the resulting current_index."""
+        self.version += 1
+        self.ops.append(dict(details, version=self.version, op=op, current_index=self.current_index))
+
+    def _reindex(self, start=0):
+        """Refresh stored positions for every track from `start` onwards."""
+        for position in range(start, len(self.queue)):
+            self._positions[self.queue[position].id] = position
+
+
+# ------------------------------------------------------------------------
+# 2. Per-User Queue Registry:
+# ------------------------------------------------------------------------
+class QueueConflictError(RuntimeError):
+    """Other workers kept winning the compare-and-swap; the mutation was not applied."""
+
+
+class QueueRegistry:
+    """
+    Holds one QueueManager per user, keyed by the session's user_id.
+    - Cached queues are re-checked against the shared store at most every
+      `revalidate_interval` seconds, so other workers' changes are picked up.
+      The check holds only that user's queue lock.
+    - mutate() saves with a compare-and-swap on the version; when another
+      worker saved first, the queue is reloaded and the change applied again.
+    - A buffered save that loses the store's flush-time check is dropped; the
+      user's cached queue is discarded so the next request loads the winner.
+    """
+
+    def __init__(self, store=None, revalidate_interval=1.0, max_attempts=5):
+        if store is None:
+            store = queue_store
+            store.on_conflict(self.discard)
+        self.store = store
+        self.revalidate_interval = revalidate_interval
+        self.max_attempts = max_attempts
+        self._queues = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the user's QueueManager, loading or refreshing it from the store."""
+        with self._lock:
+            queue_manager = self._queues.get(user_id)
+            if queue_manager is None:
+                queue_manager = self._queues[user_id] = QueueManager()
+                self._checked_at[user_id] = 0.0
+
+        with queue_manager.lock:
+            now = time.monotonic()
+            if now - self._checked_at.get(user_id, 0.0) >= self.revalidate_interval:
+                self._checked_at[user_id] = now
+                stored_version = self.store.version(user_id)
+                if stored_version is not None and stored_version != queue_manager.version:
+                    self._reload(user_id, queue_manager)
+        return queue_manager
+
+    def mutate(self, user_id, change, on_saved=None):
+        """
+        Run `change(queue_manager)` and persist the result.
+        - A change that leaves the version alone is not saved.
+        - On a version conflict the queue is reloaded from the store and
+          `change` runs again on the fresh state (up to `max_attempts` times).
+        - `on_saved(queue_manager)` runs under the queue lock after a save.
+        Returns `change`'s result from the attempt that was saved.
+        """
+        queue_manager = self.get(user_id)
+        for _ in range(self.max_attempts):
+            with queue_manager.lock:
+                expected_version = queue_manager.version
+                result = change(queue_manager)
+                if queue_manager.version == expected_version:
+                    return result
+                if self.store.save(user_id, queue_manager.to_state(), expected_version):
+                    self._checked_at[user_id] = time.monotonic()
+                    if on_saved is not None:
+                        on_saved(queue_manager)
+                    return result
+                self._reload(user_id, queue_manager)
+        raise QueueConflictError(f"Queue for user {user_id} kept changing underneath us")
+
+    def discard(self, user_id):
+        """Forget the user's queue (e.g. on logout)."""
+        with self._lock:
+            self._queues.pop(user_id, None)
+            self._checked_at.pop(user_id, None)
+
+    def _reload(self, user_id, queue_manager):
+        """Replace the cached queue with the stored snapshot (empty if there is none). Caller holds the queue lock."""
+        queue_manager.load_state(self.store.load(user_id) or {})
+        self._checked_at[user_id] = time.monotonic()
@@ -0,0 +1,292 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+from db import db, insert_ignore
+from models import QueueState
+
+# ------------------------------------------------------------------------
+# 0. Queue Store Backends:
+#    Every backend stores one snapshot per user:
+#    {'queue': [...], 'current_index': int, 'version': int, 'ops': [...]}
+#    save() is a compare-and-swap on the version: it only writes when the
+#    stored version is still `expected_version` (0 = no snapshot yet) and
+#    returns False otherwise, so two workers never both claim a version
+#    (the SQL store buffers saves and repeats the check when it flushes).
+# ------------------------------------------------------------------------
+class MemoryQueueStore:
+    """Process-local store; state is lost on restart and not shared by workers."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, user_id):
+        with self._lock:
+            state = self._states.get(user_id)
+            return copy.deepcopy(state) if state else None
+
+    def version(self, user_id):
+        with self._lock:
+            state = self._states.get(user_id)
+            return state['version'] if state else None
+
+    def save(self, user_id, state, expected_version):
+        with self._lock:
+            stored = self._states.get(user_id)
+            if (stored['version'] if stored else 0) != expected_version:
+                return False
+            self._states[user_id] = copy.deepcopy(state)
+            return True
+
+    def delete(self, user_id):
+        with self._lock:
+            self._states.pop(user_id, None)
+
+
+class RedisQueueStore:
+    """Store backed by a Redis-compatible server (Redis, Valkey, KeyDB...)."""
+
+    # Compare-and-swap on the hash's version field, atomically on the server
+    SAVE_SCRIPT = """
+    local stored = redis.call('HGET', KEYS[1], 'version') or '0'
+    if stored ~= ARGV[1] then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'state', ARGV[2], 'version', ARGV[3])
+    return 1
+    """
+
+    def __init__(self, url, prefix='melodffy:queue:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("QUEUE_STORE=redis requires the 'redis' package.") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._save = self.client.register_script(self.SAVE_SCRIPT)
+
+    def _key(self, user_id):
+        return f'{self.prefix}{user_id}'
+
+    def load(self, user_id):
+        raw = self.client.hget(self._key(user_id), 'state')
+        return json.loads(raw) if raw else None
+
+    def version(self, user_id):
+        raw = self.client.hget(self._key(user_id), 'version')
+        return int(raw) if raw is not None else None
+
+    def save(self, user_id, state, expected_version):
+        saved = self._save(
+            keys=[self._key(user_id)],
+            args=[str(expected_version), json.dumps(state), state['version']]
+        )
+        return bool(saved)
+
+    def delete(self, user_id):
+        self.client.delete(self._key(user_id))
+
+
+class SQLQueueStore:
+    """
+    Store backed by the `queue_states` table with write-behind batching.
+    - Saves are buffered per user (later saves overwrite earlier ones) and
+      written in a single transaction once `batch_size` users are dirty or
+      `flush_interval` seconds have passed, whichever comes first.
+    - The compare-and-swap is checked against the buffered snapshot; a user's
+      first buffered save also reads the stored version.
+    - Each flush writes UPDATE ... WHERE version = <version the buffer started
+      from>. If another worker saved in between, its snapshot wins: ours is
+      dropped and `on_conflict(user_id)` is called so the user's cached queue
+      is reloaded.
+    """
+
+    def __init__(self, app, flush_interval=2.0, batch_size=50, on_conflict=None):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        # user_id -> {'state': latest snapshot, 'base': stored version it replaces}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        self._thread = threading.Thread(target=self._flush_loop, name='queue-store-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def load(self, user_id):
+        with self._lock:
+            if user_id in self._pending:
+                return copy.deepcopy(self._pending[user_id]['state'])
+        with self.app.app_context():
+            row = db.session.get(QueueState, user_id)
+            return row.to_dict() if row else None
+
+    def version(self, user_id):
+        with self._lock:
+            if user_id in self._pending:
+                return self._pending[user_id]['state']['version']
+        return self._stored_version(user_id)
+
+    def save(self, user_id, state, expected_version):
+        with self._lock:
+            pending = self._pending.get(user_id)
+            if pending is not None:
+                if pending['state']['version'] != expected_version:
+                    return False
+                pending['state'] = copy.deepcopy(state)
+                return True
+
+        stored_version = self._stored_version(user_id) or 0
+        with self._lock:
+            # Another thread buffered a save while we read; let the caller reload
+            if user_id in self._pending or stored_version != expected_version:
+                return False
+            self._pending[user_id] = {'state': copy.deepcopy(state), 'base': expected_version}
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+            return True
+
+    def delete(self, user_id):
+        with self._lock:
+            self._pending.pop(user_id, None)
+        with self.app.app_context():
+            QueueState.query.filter_by(user_id=user_id).delete()
+            db.session.commit()
+
+    def flush(self):
+        """Write every buffered snapshot in one transaction, each as a compare-and-swap on its base version."""
+        with self._flush_lock:
+            with self._lock:
+                batch = {user_id: (pending['base'], pending['state']) for user_id, pending in self._pending.items()}
+            if not batch:
+                return
+
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            conflicts = []
+            with self.app.app_context():
+                try:
+                    for user_id, (base, state) in batch.items():
+                        values = {
+                            'tracks': state['queue'],
+                            'current_index': state['current_index'],
+                            'version': state['version'],
+                            'ops': state.get('ops', []),
+                            'updated_at': now
+                        }
+                        result = db.session.execute(
+                            update(QueueState)
+                            .where(QueueState.user_id == user_id, QueueState.version == base)
+                            .values(**values)
+                        )
+                        saved = result.rowcount == 1
+                        if not saved and not base:
+                            saved = insert_ignore(QueueState, [dict(values, user_id=user_id)], ['user_id']) == 1
+                        if not saved:
+                            conflicts.append(user_id)
+                    db.session.commit()
+                except Exception as e:
+                    # Everything stays buffered and is retried on the next flush
+                    db.session.rollback()
+                    logging.error(f"Queue store flush failed: {e}")
+                    return
+
+            with self._lock:
+                for user_id, (base, state) in batch.items():
+                    pending = self._pending.get(user_id)
+                    if pending is None:
+                        continue
+                    if user_id in conflicts or pending['state'] is state:
+                        del self._pending[user_id]
+                    else:
+                        # Saved again while we were writing; the next flush builds on what we just wrote
+                        pending['base'] = state['version']
+
+        for user_id in conflicts:
+            logging.warning(f"Queue for user {user_id} was saved by another worker first; dropped our buffered snapshot")
+            if self.on_conflict is not None:
+                self.on_conflict(user_id)
+
+    def _stored_version(self, user_id):
+        with self.app.app_context():
+            return db.session.query(QueueState.version).filter_by(user_id=user_id).scalar()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+# ------------------------------------------------------------------------
+# 1. Flask Extension: picks the backend from app config
+# ------------------------------------------------------------------------
+class QueueStorage:
+    """
+    Configured like the other extensions (`queue_store.init_app(app)`).
+    QUEUE_STORE selects 'sql' (default), 'redis' or 'memory'.
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryQueueStore()
+        self._conflict_listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUEUE_STORE', os.getenv('QUEUE_STORE', 'sql'))
+        app.config.setdefault('QUEUE_STORE_URL', os.getenv('QUEUE_STORE_URL', 'redis://localhost:6379/0'))
+        app.config.setdefault('QUEUE_STORE_FLUSH_INTERVAL', float(os.getenv('QUEUE_STORE_FLUSH_INTERVAL', 2.0)))
+        app.config.setdefault('QUEUE_STORE_BATCH_SIZE', int(os.getenv('QUEUE_STORE_BATCH_SIZE', 50)))
+
+        kind = app.config['QUEUE_STORE']
+        if kind == 'sql':
+            self.backend = SQLQueueStore(
+                app,
+                flush_interval=app.config['QUEUE_STORE_FLUSH_INTERVAL'],
+                batch_size=app.config['QUEUE_STORE_BATCH_SIZE'],
+                on_conflict=self._conflicted
+            )
+        elif kind == 'redis':
+            self.backend = RedisQueueStore(app.config['QUEUE_STORE_URL'])
+        elif kind == 'memory':
+            self.backend = MemoryQueueStore()
+        else:
+            raise ValueError(f"Unknown QUEUE_STORE: {kind}")
+
+    def load(self, user_id):
+        return self.backend.load(user_id)
+
+    def version(self, user_id):
+        return self.backend.version(user_id)
+
+    def save(self, user_id, state, expected_version):
+        return self.backend.save(user_id, state, expected_version)
+
+    def delete(self, user_id):
+        self.backend.delete(user_id)
+
+    def flush(self):
+        """Write any buffered saves now (only the SQL backend buffers)."""
+        if isinstance(self.backend, SQLQueueStore):
+            self.backend.flush()
+
+    def on_conflict(self, listener):
+        """Call `listener(user_id)` when a buffered save loses its flush-time compare-and-swap."""
+        self._conflict_listeners.append(listener)
+
+    def _conflicted(self, user_id):
+        for listener in self._conflict_listeners:
+            listener(user_id)
+
+
+queue_store = QueueStorage()
@@ -0,0 +1,230 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+
+from services.http_client import http_client
+from services.rate_limiter import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # Resizing is optional; Spotify's own size variants are used without it
+    Image = None
+
+SPOTIFY_IMAGE_URL = 'https://i.scdn.co/image/'
+ART_ID_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+
+# Spotify album covers come in three sizes; the size is encoded in the id's 16-char prefix
+SPOTIFY_ALBUM_VARIANTS = {
+    640: 'ab67616d0000b273',
+    300: 'ab67616d00001e02',
+    64: 'ab67616d00004851'
+}
+VARIANT_PREFIX_LENGTH = 16
+
+
+def art_id(url):
+    """The Spotify image id of an i.scdn.co URL, or None for anything else."""
+    if not url or not url.startswith(SPOTIFY_IMAGE_URL):
+        return None
+    image_id = url[len(SPOTIFY_IMAGE_URL):]
+    return image_id if ART_ID_PATTERN.match(image_id) else None
+
+
+def _mimetype(data):
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+# ------------------------------------------------------------------------
+# 0. Album Art Cache: content-addressed files on disk, LRU by bytes
+# ------------------------------------------------------------------------
+class ArtCache:
+    """
+    Fetches each cover once and keeps its resized variants on disk.
+    - blobs/<sha256> holds image bytes (identical variants are stored once);
+      keys/<image_id>-<size> names the blob for a requested variant.
+    - Album covers use Spotify's own 64/300/640 renditions; other images are
+      resized with Pillow when it is installed, else served as fetched.
+    - A blob's mtime is its last use. When the blobs outgrow ART_CACHE_MAX_BYTES
+      the least recently used ones are deleted down to 90% of the limit.
+    - Concurrent misses for the same variant share one upstream fetch.
+    """
+
+    def __init__(self, app=None):
+        self.root = None
+        self.max_bytes = 0
+        self.sizes = ()
+        self._bytes = None
+        self._lock = threading.Lock()
+        self._fetches = SingleFlight()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ART_CACHE_DIR', os.getenv('ART_CACHE_DIR', os.path.join(app.instance_path, 'art')))
+        app.config.setdefault('ART_CACHE_MAX_BYTES', int(os.getenv('ART_CACHE_MAX_BYTES', 256 * 1024 * 1024)))
+        app.config.setdefault('ART_SIZES', os.getenv('ART_SIZES', '64,300,640'))
+
+        self.root = app.config['ART_CACHE_DIR']
+        self.max_bytes = app.config['ART_CACHE_MAX_BYTES']
+        self.sizes = tuple(sorted(int(size) for size in str(app.config['ART_SIZES']).split(',')))
+        os.makedirs(os.path.join(self.root, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'keys'), exist_ok=True)
+
+    def size_for(self, requested):
+        """The smallest configured size that covers `requested` (the largest if none does)."""
+        for size in self.sizes:
+            if size >= requested:
+                return size
+        return self.sizes[-1]
+
+    def get(self, image_id, size):
+        """
+        Return (path, digest, mimetype) for the image at `size`, fetching and
+        storing it on a miss. Raises LookupError when upstream has no such image.
+        """
+        key = f'{image_id}-{size}'
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._fetches.do(key, lambda: self._lookup(key) or self._fill(key, image_id, size))
+
+    def stats(self):
+        with self._lock:
+            return {'bytes': self._usage(), 'max_bytes': self.max_bytes, 'resize': Image is not None}
+
+    # ------------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------------
+    def _lookup(self, key):
+        try:
+            with open(self._key_path(key)) as f:
+                digest = f.read().strip()
+            path = self._blob_path(digest)
+            os.utime(path)
+        except OSError:
+            return None
+        with open(path, 'rb') as f:
+            head = f.read(16)
+        return path, digest, _mimetype(head)
+
+    def _fill(self, key, image_id, size):
+        data = self._fetch_variant(image_id, size)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            self._write(path, data)
+            with self._lock:
+                self._bytes = self._usage() + len(data)
+        else:
+            os.utime(path)
+        self._write(self._key_path(key), digest.encode())
+        self._evict()
+        return path, digest, _mimetype(data)
+
+    def _fetch_variant(self, image_id, size):
+        prefix = image_id[:VARIANT_PREFIX_LENGTH]
+        if prefix in SPOTIFY_ALBUM_VARIANTS.values() and size in SPOTIFY_ALBUM_VARIANTS:
+            variant_id = SPOTIFY_ALBUM_VARIANTS[size] + image_id[VARIANT_PREFIX_LENGTH:]
+            data = self._download(variant_id)
+            if data is not None:
+                return data
+            if variant_id == image_id:
+                raise LookupError(image_id)
+
+        data = self._download(image_id)
+        if data is None:
+            raise LookupError(image_id)
+        return self._resize(data, size)
+
+    def _download(self, image_id):
+        response = http_client.get(SPOTIFY_IMAGE_URL + image_id)
+        if response.status_code != 200:
+            logging.warning(f"Album art fetch for {image_id} returned {response.status_code}")
+            return None
+        return response.content
+
+    def _resize(self, data, size):
+        if Image is None:
+            return data
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) <= size:
+                    return data
+                image.thumbnail((size, size))
+                out = io.BytesIO()
+                image.convert('RGB').save(out, 'JPEG', quality=85, optimize=True, progressive=True)
+                return out.getvalue()
+        except Exception as e:
+            logging.warning(f"Could not resize album art: {e}")
+            return data
+
+    def _evict(self):
+        with self._lock:
+            if self._usage() <= self.max_bytes:
+                return
+            # Re-read the directory: other workers share it and touch blobs too
+            blobs_dir = os.path.join(self.root, 'blobs')
+            blobs = []
+            for entry in os.scandir(blobs_dir):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in blobs)
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(blobs):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._bytes = total
+        # Keys whose blob went are rebuilt on their next request; drop them now
+        keys_dir = os.path.join(self.root, 'keys')
+        for entry in os.scandir(keys_dir):
+            try:
+                with open(entry.path) as f:
+                    if not os.path.exists(self._blob_path(f.read().strip())):
+                        os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _usage(self):
+        """Bytes held by blobs (scanned once, then tracked). Caller holds the lock."""
+        if self._bytes is None:
+            total = 0
+            for entry in os.scandir(os.path.join(self.root, 'blobs')):
+                try:
+                    total += entry.stat().st_size
+                except OSError:
+                    pass
+            self._bytes = total
+        return self._bytes
+
+    def _write(self, path, data):
+        """Write via a temp file + rename so readers never see a partial file."""
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest)
+
+    def _key_path(self, key):
+        return os.path.join(self.root, 'keys', key)
+
+
+art_cache = ArtCache()
@@ -1,11 +1,11 @@
 from flask import session, redirect, request, url_for, jsonify
 import os
 from requests_oauthlib import OAuth2Session
-import requests
 from dotenv import load_dotenv
 import logging
 from models import User
 from db import db
+from services.token_manager import token_manager
 
 load_dotenv()
 
@@ -26,9 +26,9 @@ class AuthService:
 
     def logout(self):
         """Clears session info to 'log out' the user."""
-        # Remove the stored OAuth token and user info from session
-        session.pop('oauth_token', None)
-        session.pop('user_id', None)
+        # Only this browser's server-side session goes; the user's oauth_tokens
+        # row stays for their other devices, the sync worker and autoplay
+        session.clear()
         logging.info("User logged out.")
         return redirect(url_for('main.index'))
     
@@ -37,7 +37,7 @@ class AuthService:
     # ------------------------------------------------------------------------
 
     def callback(self):
-        """Spotify OAuth callback: exchange code for token, store in session, create/find user."""
+        """Spotify OAuth callback: exchange code for token, store it server-side, create/find user."""
         try:
             oauth_state = session.get('oauth_state')
             if not oauth_state:
@@ -49,7 +49,6 @@ class AuthService:
                 authorization_response=request.url,
                 client_secret=os.getenv('SPOTIFY_CLIENT_SECRET')
             )
-            session['oauth_token'] = token
 
             # Fetch user data from Spotify
             spotify_user_data = oauth_session.get('https://api.spotify.com/v1/me').json()
@@ -67,6 +66,10 @@ class AuthService:
                     db.session.add(user)
                     db.session.commit()
                 session['user_id'] = user.id
+                token_manager.store(user.id, token)
+                if hasattr(session, 'regenerate'):
+                    # New session id on login; the pre-login id may have been seen by others
+                    session.regenerate()
             return redirect(url_for('main.index'))
         except Exception as e:
             return jsonify({'error': 'Callback failed', 'details': str(e)}), 500
@@ -76,18 +79,15 @@ class AuthService:
     # ------------------------------------------------------------------------
 
     def get_token(self):
-        """Returns the user's current access token (refresh if needed)."""
-        access_token = session.get('oauth_token', {}).get('access_token')
+        """Returns the user's current access token, refreshed ahead of expiry by the token manager."""
+        access_token = token_manager.for_session()
         if not access_token:
-            refresh_token = session.get('oauth_token', {}).get('refresh_token')
-            if refresh_token:
-                access_token = self.refresh_access_token(refresh_token)
-                if access_token:
-                    session['oauth_token']['access_token'] = access_token
-                else:
-                    logging.error("Failed to refresh access token.")
-                    return jsonify({'error': 'Failed to refresh access token'}), 401
-        return jsonify({'access_token': access_token})
+            logging.error("No valid access token for the session.")
+            return jsonify({'error': 'Failed to refresh access token'}), 401
+        return jsonify({
+            'access_token': access_token,
+            'expires_in': token_manager.expires_in(session.get('user_id'))
+        })
 
     def create_oauth_session(self, state=None):
         """Creates an OAuth2Session for Spotify OAuth."""
@@ -95,6 +95,7 @@ class AuthService:
         redirect_uri = os.getenv('SPOTIFY_REDIRECT_URI')
         scopes = [
             'user-library-read',
+            'user-library-modify',
             'user-modify-playback-state',
             'user-read-playback-state',
             'user-read-currently-playing',
@@ -115,22 +116,5 @@ class AuthService:
         )
 
     def refresh_access_token(self, refresh_token):
-        """Helper to refresh an expired Spotify token."""
-        try:
-            payload = {
-                'grant_type': 'refresh_token',
-                'refresh_token': refresh_token,
-                'client_id': os.getenv('SPOTIFY_CLIENT_ID'),
-                'client_secret': os.getenv('SPOTIFY_CLIENT_SECRET')
-            }
-            response = requests.post('https://accounts.spotify.com/api/token', data=payload)
-            if response.status_code == 200:
-                new_tokens = response.json()
-                logging.info("Access token refreshed successfully.")
-                return new_tokens.get('access_token')
-            else:
-                logging.error(f"Failed to refresh token. Response: {response.json()}")
-                return None
-        except Exception as e:
-            logging.error(f"Exception during token refresh: {str(e)}")
-            return None
+        """Helper to refresh an expired Spotify token; returns the whole token response (or None)."""
+        return token_manager.request_refresh(refresh_token)
@@ -0,0 +1,315 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from services.event_bus import event_bus
+from services.spotify_service import SpotifyService
+from services.token_manager import token_manager
+
+# ------------------------------------------------------------------------
+# 0. Server-Side Autoplay Scheduler:
+# ------------------------------------------------------------------------
+class AutoplayScheduler:
+    """
+    Advances a user's server queue when the current queued track ends, so
+    playback keeps going with the browser tab closed.
+    - watch() starts following a queued track the user just played; the
+      track's end is predicted from its duration and the reported position.
+    - A player-state read every AUTOPLAY_POLL_INTERVAL seconds (and one
+      AUTOPLAY_FINAL_CHECK seconds before the end) corrects drift, pauses,
+      seeks and tracks changed from another device.
+    - AUTOPLAY_PREFETCH seconds before the end the next track's metadata is
+      fetched, so the hand-off itself is a single me/player/play call issued
+      AUTOPLAY_LEAD_MS before the current track finishes.
+    A watch is dropped on a 401, when the queue runs out, when something
+    outside the queue is played, or after AUTOPLAY_IDLE_TIMEOUT seconds paused.
+    Each gunicorn worker only follows the users whose play requests it served.
+    """
+
+    def __init__(self, app=None, registry=None):
+        self.app = None
+        self.registry = None
+        self.spotify_service = SpotifyService()
+        self._executor = None
+        self._watches = {}  # user_id -> watch dict, see watch()
+        self._condition = threading.Condition()
+        if app is not None:
+            self.init_app(app, registry)
+
+    def init_app(self, app, registry):
+        app.config.setdefault('AUTOPLAY_ENABLED', os.getenv('AUTOPLAY_ENABLED', '1') not in ('0', 'false', 'False'))
+        app.config.setdefault('AUTOPLAY_WORKERS', int(os.getenv('AUTOPLAY_WORKERS', 2)))
+        app.config.setdefault('AUTOPLAY_POLL_INTERVAL', float(os.getenv('AUTOPLAY_POLL_INTERVAL', 15)))
+        app.config.setdefault('AUTOPLAY_FINAL_CHECK', float(os.getenv('AUTOPLAY_FINAL_CHECK', 5)))
+        app.config.setdefault('AUTOPLAY_PREFETCH', float(os.getenv('AUTOPLAY_PREFETCH', 20)))
+        app.config.setdefault('AUTOPLAY_LEAD_MS', int(os.getenv('AUTOPLAY_LEAD_MS', 250)))
+        app.config.setdefault('AUTOPLAY_IDLE_TIMEOUT', float(os.getenv('AUTOPLAY_IDLE_TIMEOUT', 1800)))
+
+        self.app = app
+        self.registry = registry
+        if not app.config['AUTOPLAY_ENABLED']:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=app.config['AUTOPLAY_WORKERS'], thread_name_prefix='autoplay')
+        threading.Thread(target=self._loop, name='autoplay-scheduler', daemon=True).start()
+
+    # ------------------------------------------------------------------------
+    # Hooks called by the playback routes
+    # ------------------------------------------------------------------------
+    def watch(self, user_id, access_token, track_id, position_ms=0):
+        """
+        The user started `track_id` at `position_ms`. Follow it if it is in
+        their queue (making it current there); otherwise stop following.
+        """
+        if self._executor is None:
+            return
+        def make_current(queue_manager):
+            position = queue_manager.position_of(track_id)
+            if position is None:
+                return None
+            if position != queue_manager.current_index:
+                queue_manager.jump_to(track_id)
+            return queue_manager.queue[position]
+
+        track = self._mutate(user_id, make_current)
+        if track is None:
+            self.unwatch(user_id)
+            return
+        self._start(user_id, access_token, track_id, track.duration_ms, position_ms)
+
+    def paused(self, user_id):
+        """Playback was paused; keep the watch but only poll until it resumes."""
+        with self._condition:
+            watch = self._watches.get(user_id)
+            if watch is not None:
+                watch['paused'] = True
+                self._plan(watch)
+                self._condition.notify()
+
+    def poke(self, user_id, delay=1.0):
+        """Something changed outside our view (next/prev/transfer); re-read the player soon."""
+        with self._condition:
+            watch = self._watches.get(user_id)
+            if watch is not None and not watch['running']:
+                watch['due'], watch['action'] = time.monotonic() + delay, 'check'
+                self._condition.notify()
+
+    def unwatch(self, user_id):
+        with self._condition:
+            self._watches.pop(user_id, None)
+
+    def is_watching(self, user_id):
+        with self._condition:
+            return user_id in self._watches
+
+    # ------------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------------
+    def _start(self, user_id, access_token, track_id, duration_ms, position_ms):
+        with self._condition:
+            previous = self._watches.get(user_id)
+            watch = self._watches[user_id] = {
+                'user_id': user_id,
+                'token': access_token,
+                'track_id': track_id,
+                'duration_ms': duration_ms,
+                # Monotonic time at which the track was (or would have been) at 0 ms
+                'anchor': time.monotonic() - position_ms / 1000,
+                'paused': False,
+                'idle_since': None,
+                'final_checked': False,
+                'next': None,
+                'generation': previous['generation'] + 1 if previous else 0,
+                'running': False,
+                'due': None,
+                'action': None
+            }
+            self._plan(watch)
+            self._condition.notify()
+
+    def _plan(self, watch):
+        """Pick the watch's next action and when to run it. Caller holds the condition."""
+        now = time.monotonic()
+        config = self.app.config
+        poll_at = now + config['AUTOPLAY_POLL_INTERVAL']
+        if watch['paused'] or not watch['duration_ms']:
+            # Unknown duration (or nothing playing): only the player can tell us more
+            delay = 1.0 if not watch['duration_ms'] and not watch['paused'] else config['AUTOPLAY_POLL_INTERVAL']
+            watch['due'], watch['action'] = now + delay, 'check'
+            return
+
+        advance_at = watch['anchor'] + (watch['duration_ms'] - config['AUTOPLAY_LEAD_MS']) / 1000
+        final_check_at = advance_at - config['AUTOPLAY_FINAL_CHECK']
+        prefetch_at = advance_at - config['AUTOPLAY_PREFETCH']
+
+        candidates = [(advance_at, 'advance')]
+        if watch['next'] is None:
+            candidates.append((max(prefetch_at, now), 'prefetch'))
+        if final_check_at > now and not watch['final_checked']:
+            candidates.append((final_check_at, 'final_check'))
+        if poll_at < final_check_at:
+            candidates.append((poll_at, 'check'))
+        watch['due'], watch['action'] = min(candidates)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                due = [w for w in self._watches.values() if not w['running'] and w['due'] is not None and w['due'] <= now]
+                for watch in due:
+                    watch['running'] = True
+                    self._executor.submit(self._run, watch, watch['action'], watch['generation'])
+                pending = [w['due'] for w in self._watches.values() if not w['running'] and w['due'] is not None]
+                timeout = max(0.0, min(pending) - now) if pending else None
+                self._condition.wait(timeout)
+
+    def _run(self, watch, action, generation):
+        try:
+            with self.app.app_context():
+                # Tokens are refreshed ahead of expiry, so a watch outlives the one it started with
+                watch['token'] = token_manager.get_access_token(watch['user_id']) or watch['token']
+                if action in ('check', 'final_check'):
+                    keep = self._check(watch)
+                    watch['final_checked'] = watch['final_checked'] or action == 'final_check'
+                elif action == 'prefetch':
+                    keep = self._prefetch(watch)
+                else:
+                    keep = self._advance(watch)
+        except Exception as e:
+            logging.exception(f"Autoplay {action} failed for user {watch['user_id']}: {e}")
+            keep = True
+
+        with self._condition:
+            current = self._watches.get(watch['user_id'])
+            if current is not watch or current['generation'] != generation:
+                # Replaced by watch()/_advance() while we ran
+                return
+            watch['running'] = False
+            if keep:
+                self._plan(watch)
+            else:
+                del self._watches[watch['user_id']]
+            self._condition.notify()
+
+    # ------------------------------------------------------------------------
+    # Actions (run on the executor, inside an app context)
+    # ------------------------------------------------------------------------
+    def _check(self, watch):
+        """Re-anchor the watch on Spotify's reported player state; returns False to drop it."""
+        response = self.spotify_service.spotify_api_call('me/player', 'GET', access_token=watch['token'])
+        if response is None:
+            return True
+        if response.status_code == 401:
+            return False
+        if response.status_code != 200:
+            # 204: nothing is playing on any device
+            return self._idle(watch)
+
+        state = response.json() or {}
+        item = state.get('item') or {}
+        if not item.get('id'):
+            return self._idle(watch)
+        with self._condition:
+            watch['idle_since'] = None
+            anchor = time.monotonic() - state.get('progress_ms', 0) / 1000
+            if abs(anchor - watch['anchor']) > 2:
+                # A seek, not just drift: the end moved, so check again before it
+                watch['final_checked'] = False
+            watch['paused'] = not state.get('is_playing', False)
+            watch['duration_ms'] = item.get('duration_ms') or watch['duration_ms']
+            watch['anchor'] = anchor
+        if item['id'] != watch['track_id']:
+            # Changed elsewhere: keep following only if the new track is queued too
+            self._executor.submit(self._rewatch, watch['user_id'], watch['token'], item['id'], state.get('progress_ms', 0))
+            return False
+        return True
+
+    def _idle(self, watch):
+        """Mark the watch paused; returns False once it has been idle for AUTOPLAY_IDLE_TIMEOUT."""
+        now = time.monotonic()
+        with self._condition:
+            watch['paused'] = True
+            watch['idle_since'] = watch['idle_since'] or now
+            return now - watch['idle_since'] < self.app.config['AUTOPLAY_IDLE_TIMEOUT']
+
+    def _rewatch(self, user_id, access_token, track_id, position_ms):
+        with self.app.app_context():
+            self.watch(user_id, access_token, track_id, position_ms)
+
+    def _prefetch(self, watch):
+        """Resolve the track after the watched one, filling in its duration if the queue lacks it."""
+        track = self._next_in_queue(watch)
+        if track is None:
+            watch['next'] = False
+            return True
+        if not track.duration_ms:
+            response = self.spotify_service.spotify_api_call(
+                f'tracks/{track.id}', 'GET', player_related=False, access_token=watch['token']
+            )
+            if response is not None and response.status_code == 200:
+                track = replace(track, duration_ms=response.json().get('duration_ms') or 0)
+        watch['next'] = track
+        return True
+
+    def _advance(self, watch):
+        """
+        Make the next queued track current and start it on Spotify.
+        The move is claimed through the queue's compare-and-swap: it only
+        happens while the watched track is still current, so when another
+        worker (or the user) moved on first, this one backs off instead of
+        skipping a second time.
+        """
+        user_id = watch['user_id']
+
+        def make_next_current(queue_manager):
+            position = queue_manager.position_of(watch['track_id'])
+            if position is None or position != queue_manager.current_index:
+                return None
+            if position + 1 >= len(queue_manager.queue):
+                return None
+            return queue_manager.jump_to(queue_manager.queue[position + 1].id)
+
+        track = self._mutate(user_id, make_next_current)
+        if track is None:
+            return False
+
+        if watch['next'] and watch['next'].id == track.id and watch['next'].duration_ms:
+            duration_ms = watch['next'].duration_ms
+        else:
+            duration_ms = track.duration_ms
+        _, status_code = self.spotify_service.play_song(
+            {'song_id': track.id}, access_token=watch['token'], user_id=user_id
+        )
+        if status_code == 401:
+            return False
+        if status_code >= 400:
+            logging.error(f"Autoplay could not start {track.id} for user {user_id}: {status_code}")
+            return False
+        self._start(user_id, watch['token'], track.id, duration_ms, 0)
+        return True
+
+    def _next_in_queue(self, watch):
+        queue_manager = self.registry.get(watch['user_id'])
+        with queue_manager.lock:
+            position = queue_manager.position_of(watch['track_id'])
+            if position is None or position + 1 >= len(queue_manager.queue):
+                return None
+            return queue_manager.queue[position + 1]
+
+    def _mutate(self, user_id, change):
+        """Apply `change` through the registry and notify subscribers, like QueueService._mutate."""
+        def publish(queue_manager):
+            current = queue_manager.queue[queue_manager.current_index]
+            event_bus.publish(user_id, 'queue', {
+                'op': 'autoplay',
+                'id': current.id,
+                'queue_version': queue_manager.version,
+                'current_index': queue_manager.current_index
+            })
+
+        return self.registry.mutate(user_id, change, on_saved=publish)
+
+
+autoplay_scheduler = AutoplayScheduler()
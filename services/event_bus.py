@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func, literal, select
+
+from db import db, dialect_insert
+from models import UserEvent
+
+
+# ------------------------------------------------------------------------
+# 0. Event Log Backends:
+#    Each user has one event sequence numbered 1, 2, 3... and only the last
+#    `history` events are kept. append() returns the new event's version;
+#    read() returns (events after `since`, latest version, oldest kept version).
+# ------------------------------------------------------------------------
+class MemoryEventLog:
+    """Process-local log; versions restart with the process and are not shared by workers."""
+
+    def __init__(self, history=200):
+        self.history = history
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def append(self, user_id, event_type, data, ts):
+        with self._lock:
+            log = self._logs.setdefault(user_id, {'version': 0, 'events': deque(maxlen=self.history)})
+            log['version'] += 1
+            log['events'].append({'version': log['version'], 'type': event_type, 'data': data, 'ts': ts})
+            return log['version']
+
+    def read(self, user_id, since):
+        with self._lock:
+            log = self._logs.get(user_id)
+            if log is None:
+                return [], 0, None
+            events = [event for event in log['events'] if event['version'] > since]
+            oldest = log['events'][0]['version'] if log['events'] else None
+            return events, log['version'], oldest
+
+
+class SQLEventLog:
+    """
+    Log in the `user_events` table, shared by every worker. The next version
+    is computed and inserted in one INSERT ... SELECT max(version) + 1
+    statement, so it is never based on a stale read; when two workers still
+    collide on (user_id, version), the loser's insert is ignored and retried.
+    """
+
+    def __init__(self, app, history=200, max_attempts=5):
+        self.app = app
+        self.history = history
+        self.max_attempts = max_attempts
+
+    def append(self, user_id, event_type, data, ts):
+        with self.app.app_context():
+            next_version = select(
+                literal(user_id),
+                func.coalesce(func.max(UserEvent.version), 0) + 1,
+                literal(event_type),
+                literal(data, UserEvent.data.type),
+                literal(ts)
+            ).where(UserEvent.user_id == user_id)
+            stmt = dialect_insert(UserEvent).from_select(
+                ['user_id', 'version', 'type', 'data', 'ts'], next_version
+            ).on_conflict_do_nothing(index_elements=['user_id', 'version']).returning(UserEvent.version)
+            try:
+                for _ in range(self.max_attempts):
+                    version = db.session.execute(stmt).scalar()
+                    if version is not None:
+                        UserEvent.query.filter(
+                            UserEvent.user_id == user_id, UserEvent.version <= version - self.history
+                        ).delete(synchronize_session=False)
+                        db.session.commit()
+                        return version
+                    db.session.rollback()
+            except Exception:
+                db.session.rollback()
+                raise
+        raise RuntimeError(f"Could not claim an event version for user {user_id}")
+
+    def read(self, user_id, since):
+        with self.app.app_context():
+            oldest, latest = db.session.query(
+                func.min(UserEvent.version), func.max(UserEvent.version)
+            ).filter_by(user_id=user_id).one()
+            events = []
+            if latest is not None and latest > since:
+                rows = UserEvent.query.filter(
+                    UserEvent.user_id == user_id, UserEvent.version > since
+                ).order_by(UserEvent.version).all()
+                events = [row.to_dict() for row in rows]
+            return events, latest or 0, oldest
+
+
+# ------------------------------------------------------------------------
+# 1. Per-User Event Bus (queue mutations, playback changes):
+# ------------------------------------------------------------------------
+class EventBus:
+    """
+    Pub/sub keyed by user_id. Every event gets the next number in that
+    user's sequence, so clients can resume with `since=<last seen>`; a client
+    that falls behind the retained history is told to resync from a full snapshot.
+    - EVENT_STORE='sql' (default) keeps the sequence in the database, so
+      versions agree across gunicorn workers and a subscriber sees events
+      published by any worker within EVENT_POLL_INTERVAL seconds. 'memory'
+      is for a single process.
+    - Publishes on this process wake its subscribers immediately.
+    - Open streams and long-polls each hold a server thread. At most
+      EVENT_MAX_WAITERS of them block at once per process, leaving the rest
+      of the gthread pool for ordinary requests; keep it below --threads.
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryEventLog()
+        self.poll_interval = 1.0
+        self.waiters = threading.BoundedSemaphore(24)
+        self._signals = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_STORE', os.getenv('EVENT_STORE', 'sql'))
+        app.config.setdefault('EVENT_HISTORY', int(os.getenv('EVENT_HISTORY', 200)))
+        app.config.setdefault('EVENT_POLL_INTERVAL', float(os.getenv('EVENT_POLL_INTERVAL', 1.0)))
+        app.config.setdefault('EVENT_MAX_WAITERS', int(os.getenv('EVENT_MAX_WAITERS', 24)))
+
+        kind = app.config['EVENT_STORE']
+        if kind == 'sql':
+            self.backend = SQLEventLog(app, history=app.config['EVENT_HISTORY'])
+        elif kind == 'memory':
+            self.backend = MemoryEventLog(history=app.config['EVENT_HISTORY'])
+        else:
+            raise ValueError(f"Unknown EVENT_STORE: {kind}")
+        self.poll_interval = app.config['EVENT_POLL_INTERVAL']
+        self.waiters = threading.BoundedSemaphore(app.config['EVENT_MAX_WAITERS'])
+
+    def _signal(self, user_id):
+        with self._lock:
+            signal = self._signals.get(user_id)
+            if signal is None:
+                signal = self._signals[user_id] = {'generation': 0, 'condition': threading.Condition()}
+            return signal
+
+    def publish(self, user_id, event_type, data):
+        """Append an event for the user and wake this process's subscribers; returns its version (None on failure)."""
+        try:
+            version = self.backend.append(user_id, event_type, data, time.time())
+        except Exception as e:
+            logging.error(f"Could not publish {event_type} event for user {user_id}: {e}")
+            return None
+        signal = self._signal(user_id)
+        with signal['condition']:
+            signal['generation'] += 1
+            signal['condition'].notify_all()
+        return version
+
+    def current_version(self, user_id):
+        return self.backend.read(user_id, float('inf'))[1]
+
+    def events_since(self, user_id, since):
+        """
+        Return (events, resync): events with version > since, and whether the
+        client missed events that are no longer retained.
+        """
+        events, latest, oldest = self.backend.read(user_id, since)
+        if oldest is None:
+            oldest = latest + 1
+        # A client ahead of us (e.g. memory store after a restart) must resync too
+        resync = since > latest or (since < latest and since + 1 < oldest)
+        return events, resync
+
+    def wait(self, user_id, since, timeout):
+        """
+        Block until there are events after `since` or `timeout` elapses; returns (events, resync).
+        The log is re-read on every local publish and at least every poll_interval.
+        """
+        deadline = time.monotonic() + timeout
+        signal = self._signal(user_id)
+        while True:
+            with signal['condition']:
+                generation = signal['generation']
+            events, resync = self.events_since(user_id, since)
+            remaining = deadline - time.monotonic()
+            if events or resync or remaining <= 0:
+                return events, resync
+            with signal['condition']:
+                signal['condition'].wait_for(
+                    lambda: signal['generation'] != generation,
+                    timeout=min(self.poll_interval, remaining)
+                )
+
+
+event_bus = EventBus()
@@ -0,0 +1,60 @@
+import os
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection failures are retried this many times before giving up
+CONNECT_RETRIES = 2
+
+# ------------------------------------------------------------------------
+# 0. Shared, pooled HTTP client for Spotify:
+# ------------------------------------------------------------------------
+class HttpClient:
+    """
+    One requests.Session shared by every service and thread.
+    - Keep-alive pools are sized per host (API traffic vs. the token endpoint).
+    - Every call gets a (connect, read) timeout unless the caller passes one.
+    - Cookies are never stored, so nothing leaks between users sharing the session.
+    - Only connection failures are retried here; HTTP errors go back to the caller.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, pool_sizes=None):
+        self.timeout = (connect_timeout, read_timeout)
+        # Longest one request can take: every connect attempt times out, then the read does
+        self.max_request_seconds = connect_timeout * (1 + CONNECT_RETRIES) + read_timeout
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        retry = Retry(total=CONNECT_RETRIES, connect=CONNECT_RETRIES, read=0, status=0, backoff_factor=0.2)
+        for prefix, pool_size in (pool_sizes or {}).items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            self.session.mount(prefix, adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+http_client = HttpClient(
+    connect_timeout=float(os.getenv('SPOTIFY_CONNECT_TIMEOUT', 3.05)),
+    read_timeout=float(os.getenv('SPOTIFY_READ_TIMEOUT', 10)),
+    pool_sizes={
+        'https://api.spotify.com/': int(os.getenv('SPOTIFY_API_POOL_SIZE', 20)),
+        'https://accounts.spotify.com/': int(os.getenv('SPOTIFY_ACCOUNTS_POOL_SIZE', 4)),
+        'https://i.scdn.co/': int(os.getenv('SPOTIFY_IMAGE_POOL_SIZE', 8))
+    }
+)
@@ -0,0 +1,206 @@
+import re
+import threading
+
+from sqlalchemy import func, inspect, text
+
+from db import db
+from models import Like, Recent
+
+# Query words beyond this are ignored; every word is matched as a prefix
+MAX_QUERY_TERMS = 8
+
+# Expression indexed by the Postgres GIN indexes (see the library search migration)
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(artist, '') || ' ' || coalesce(album, ''))"
+)
+
+# Tables/triggers that live outside the models; autogenerate must leave them alone
+SEARCH_TABLES = ('library_search_docs', 'library_fts')
+SEARCH_INDEXES = ('ix_liked_songs_search', 'ix_recently_played_search')
+
+
+def query_terms(query):
+    """Lower-cased word tokens of `query` (letters/digits only, so they are safe to splice into MATCH syntax)."""
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Alembic autogenerate filter: skip the search index objects created by hand in migrations."""
+    if type_ == 'table' and name.startswith(SEARCH_TABLES):
+        # Includes FTS5's shadow tables (library_fts_data, library_fts_idx, ...)
+        return False
+    if type_ == 'index' and name in SEARCH_INDEXES:
+        return False
+    return True
+
+
+# ------------------------------------------------------------------------
+# 0. SQLite: FTS5 over library_search_docs (kept in step by triggers)
+# ------------------------------------------------------------------------
+class FTS5Backend:
+    """
+    liked_songs / recently_played triggers maintain one library_search_docs
+    row per (user, source, track) and that table's triggers maintain the
+    library_fts index, so likes, unlikes and syncs update it in the same
+    transaction. Each document carries an `owner` token ('u<user_id>') so a
+    MATCH only ever touches that user's documents.
+    """
+    name = 'fts5'
+
+    def search(self, user_id, terms, limit):
+        match = f'owner:u{user_id} AND {{name artist album}}: (' + ' '.join(f'"{t}"*' for t in terms) + ')'
+        rows = db.session.execute(text(
+            "SELECT d.track_id FROM library_fts "
+            "JOIN library_search_docs d ON d.id = library_fts.rowid "
+            "WHERE library_fts MATCH :match "
+            "ORDER BY bm25(library_fts, 0.0, 10.0, 5.0, 2.0) "
+            "LIMIT :limit"
+        ), {'match': match, 'limit': limit * 2})
+        return list(dict.fromkeys(track_id for (track_id,) in rows))[:limit]
+
+
+# ------------------------------------------------------------------------
+# 1. Postgres: GIN indexes on a tsvector expression
+# ------------------------------------------------------------------------
+class TSVectorBackend:
+    """Expression indexes are maintained by Postgres itself on every write."""
+    name = 'tsvector'
+
+    def search(self, user_id, terms, limit):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        rows = db.session.execute(text(
+            "SELECT id, max(rank) AS rank FROM ("
+            f"  SELECT id, ts_rank({PG_SEARCH_VECTOR}, q) AS rank"
+            "   FROM liked_songs, to_tsquery('simple', :q) q"
+            f"  WHERE user_id = :user_id AND {PG_SEARCH_VECTOR} @@ q"
+            "  UNION ALL"
+            f"  SELECT id, ts_rank({PG_SEARCH_VECTOR}, q)"
+            "   FROM recently_played, to_tsquery('simple', :q) q"
+            f"  WHERE user_id = :user_id AND {PG_SEARCH_VECTOR} @@ q"
+            ") hits GROUP BY id ORDER BY rank DESC LIMIT :limit"
+        ), {'q': tsquery, 'user_id': user_id, 'limit': limit})
+        return [track_id for track_id, _ in rows]
+
+
+# ------------------------------------------------------------------------
+# 2. Anything else: in-process trigram index per user
+# ------------------------------------------------------------------------
+class TrigramBackend:
+    """
+    Builds a trigram -> track ids map per user from their Like/Recent rows.
+    Each search first compares a cheap fingerprint of the user's rows (counts
+    and newest timestamps, answered from indexes) and rebuilds only that
+    user's index when it changed.
+    """
+    name = 'trigram'
+
+    def __init__(self, max_users=256):
+        self.max_users = max_users
+        self._indexes = {}  # user_id -> {'fingerprint', 'words', 'grams', 'order'}
+        self._lock = threading.Lock()
+
+    def search(self, user_id, terms, limit):
+        index = self._index_for(user_id)
+        candidates = None
+        for term in terms:
+            grams = self._grams(term)
+            if not grams:
+                continue
+            for gram in grams:
+                ids = index['grams'].get(gram, set())
+                candidates = ids if candidates is None else candidates & ids
+        pool = candidates if candidates is not None else index['words'].keys()
+
+        scored = []
+        for track_id in pool:
+            name_words, other_words = index['words'][track_id]
+            score = 0
+            for term in terms:
+                if any(word.startswith(term) for word in name_words):
+                    score += 2
+                elif any(word.startswith(term) for word in other_words):
+                    score += 1
+                else:
+                    break
+            else:
+                scored.append((-score, index['order'][track_id], track_id))
+        return [track_id for _, _, track_id in sorted(scored)[:limit]]
+
+    def _index_for(self, user_id):
+        fingerprint = self._fingerprint(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index['fingerprint'] == fingerprint:
+                return index
+
+        words, grams, order = {}, {}, {}
+        for model, newest_first in ((Like, Like.added_at.desc()), (Recent, Recent.played_at.desc())):
+            rows = db.session.query(model.id, model.name, model.artist, model.album).filter(
+                model.user_id == user_id
+            ).order_by(newest_first)
+            for track_id, name, artist, album in rows:
+                if track_id in words:
+                    continue
+                name_words = query_terms(name or '')
+                other_words = query_terms(f'{artist or ""} {album or ""}')
+                words[track_id] = (name_words, other_words)
+                order[track_id] = len(order)
+                for word in name_words + other_words:
+                    for gram in self._grams(word):
+                        grams.setdefault(gram, set()).add(track_id)
+
+        index = {'fingerprint': fingerprint, 'words': words, 'grams': grams, 'order': order}
+        with self._lock:
+            if len(self._indexes) >= self.max_users and user_id not in self._indexes:
+                self._indexes.pop(next(iter(self._indexes)))
+            self._indexes[user_id] = index
+        return index
+
+    def _fingerprint(self, user_id):
+        liked = db.session.query(func.count(), func.max(Like.added_at)).filter(Like.user_id == user_id).one()
+        recent = db.session.query(func.count(), func.max(Recent.played_at)).filter(Recent.user_id == user_id).one()
+        return tuple(liked) + tuple(recent)
+
+    @staticmethod
+    def _grams(word):
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+# ------------------------------------------------------------------------
+# 3. Library Search: picks the backend for the configured database
+# ------------------------------------------------------------------------
+class LibrarySearch:
+    """
+    Prefix search over the user's own liked and recently played tracks.
+    SQLite uses FTS5 and Postgres a tsvector/GIN index when the migration
+    created them; other databases (or a SQLite build without FTS5) fall back
+    to an in-process trigram index. Returns ordered track ids.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = self._pick_backend()
+            return self._backend
+
+    def search(self, user_id, query, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        return self.backend.search(user_id, terms, limit)
+
+    def _pick_backend(self):
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite' and inspect(db.engine).has_table('library_fts'):
+            return FTS5Backend()
+        if dialect == 'postgresql':
+            return TSVectorBackend()
+        return TrigramBackend()
+
+
+library_search = LibrarySearch()
@@ -1,22 +1,137 @@
-
-from queue_manager import QueueManager
-from flask import jsonify
+from queue_manager import QueueRegistry
+from flask import jsonify, request, session
+from services.event_bus import event_bus
 
 class QueueService:
     def __init__(self):
-        self.queue_manager = QueueManager()
+        self.registry = QueueRegistry()
+
+    def _queue_manager(self):
+        """Return the QueueManager for the session's user, or None if logged out."""
+        user_id = session.get('user_id')
+        if not user_id:
+            return None
+        return self.registry.get(user_id)
+
+    def _mutate(self, user_id, change, op, **details):
+        """
+        Apply `change` through the registry (compare-and-swap save, retried on
+        conflicts) and notify subscribers once it is stored. Returns `change`'s result.
+        """
+        def publish(queue_manager):
+            event_bus.publish(user_id, 'queue', dict(
+                details, op=op, queue_version=queue_manager.version, current_index=queue_manager.current_index
+            ))
+
+        return self.registry.mutate(user_id, change, on_saved=publish)
 
-    def view_queue(self):
-        return jsonify({'queue': self.queue_manager.get_queue(), 'current_index': self.queue_manager.current_index})
+    def view_queue(self, since=None):
+        """
+        Full snapshot, or with `since` only the ops applied after that version.
+        Either way the ETag is the queue version, so an unchanged queue is a 304.
+        """
+        queue_manager = self._queue_manager()
+        if queue_manager is None:
+            return jsonify({'error': 'User not authenticated'}), 401
+        with queue_manager.lock:
+            version = queue_manager.version
+            etag = f"q{session['user_id']}-{version}"
+            # Weak match: compression turns the ETag into W/"..." on the way out
+            if request.if_none_match.contains_weak(etag):
+                response = jsonify()
+            else:
+                ops = queue_manager.ops_since(since) if since is not None else None
+                if ops is not None:
+                    response = jsonify({'version': version, 'current_index': queue_manager.current_index, 'ops': ops})
+                else:
+                    snapshot = {
+                        'queue': queue_manager.get_queue(),
+                        'current_index': queue_manager.current_index,
+                        'version': version
+                    }
+                    if since is not None:
+                        # The requested version fell out of the op log (or is ahead of us)
+                        snapshot['resync'] = True
+                    response = jsonify(snapshot)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
 
     def add_to_queue(self, track_info):
-        self.queue_manager.add_to_queue([track_info])
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        self._mutate(user_id, lambda queue_manager: queue_manager.add_to_queue([track_info]), 'add')
         return jsonify({'message': 'Track successfully added to the queue!'}), 200
 
     def remove_from_queue(self, track_id):
-        self.queue_manager.remove_from_queue(track_id)
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        self._mutate(user_id, lambda queue_manager: queue_manager.remove_from_queue(track_id), 'remove', ids=[track_id])
         return jsonify({'message': 'Track successfully removed from the queue!'}), 200
 
+    def add_many(self, tracks):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        added = len(self._mutate(user_id, lambda queue_manager: queue_manager.add_to_queue(tracks), 'add'))
+        return jsonify({'message': f'{added} track(s) added to the queue!', 'added': added}), 200
+
+    def remove_many(self, track_ids):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        removed = self._mutate(user_id, lambda queue_manager: queue_manager.remove_many(track_ids), 'remove', ids=list(track_ids))
+        return jsonify({'message': f'{removed} track(s) removed from the queue!', 'removed': removed}), 200
+
+    def move_tracks(self, start, count, to):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+
+        def move(queue_manager):
+            queue_manager.move(start, count, to)
+            return queue_manager.current_index
+
+        try:
+            current_index = self._mutate(user_id, move, 'move', start=start, count=count, to=to)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'message': 'Tracks moved!', 'current_index': current_index}), 200
+
+    def reorder_queue(self, track_ids):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+
+        def reorder(queue_manager):
+            queue_manager.reorder(track_ids)
+            return queue_manager.current_index
+
+        try:
+            current_index = self._mutate(user_id, reorder, 'reorder')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'message': 'Queue reordered!', 'current_index': current_index}), 200
+
+    def jump_to_track(self, track_id):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+
+        def jump(queue_manager):
+            track = queue_manager.jump_to(track_id)
+            return track, queue_manager.current_index
+
+        track, current_index = self._mutate(user_id, jump, 'jump', id=track_id)
+        if track is None:
+            return jsonify({'error': 'Track not found in queue'}), 404
+        return jsonify({'track': track.to_dict(), 'current_index': current_index}), 200
+
     def clear_queue(self):
-        self.queue_manager.clear_queue()
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        self._mutate(user_id, lambda queue_manager: queue_manager.clear_queue(), 'clear')
         return jsonify({'message': 'Queue successfully cleared!'}), 200
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from services.response_cache import CachedResponse
+
+# ------------------------------------------------------------------------
+# 0. Token Bucket:
+# ------------------------------------------------------------------------
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`. Not thread-safe on its own."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """Take one token, going into debt if necessary; returns the seconds until it is really ours."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        self.tokens += 1
+
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+# ------------------------------------------------------------------------
+# 1. Global + Per-User Rate Limiter for Spotify's app quota:
+# ------------------------------------------------------------------------
+class RateLimiter:
+    """
+    Spaces out upstream calls so the app stays inside Spotify's quota.
+    - Every call takes a token from the global bucket and from the bucket of
+      its token scope (one per access token), so one user's burst cannot use
+      up the whole app's budget.
+    - A 429's Retry-After pauses every scope until it has passed.
+    - Callers wait at most `max_wait` seconds; past that acquire() fails and
+      the caller answers 429 itself instead of queueing indefinitely.
+    Buckets and the 429 pause live in this process only. With `workers`
+    processes (gunicorn's WEB_CONCURRENCY) each gets 1/workers of every
+    budget, so together they stay inside the configured rates; a 429 pauses
+    only the worker that received it, the others stop on their own first 429.
+    """
+
+    def __init__(self, rate, burst, user_rate, user_burst, max_wait=5.0, max_scopes=10000, workers=1):
+        workers = max(1, workers)
+        self.workers = workers
+        self.global_bucket = TokenBucket(rate / workers, max(1, burst // workers))
+        self.user_rate = user_rate / workers
+        self.user_burst = max(1, user_burst // workers)
+        self.max_wait = max_wait
+        self.max_scopes = max_scopes
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope_for(access_token):
+        """A stable key for the user behind `access_token` that does not keep the token itself around."""
+        return hashlib.sha256((access_token or '').encode()).hexdigest()[:16]
+
+    def acquire(self, scope):
+        """Wait for a slot for `scope`; returns False if that would take longer than max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._scopes.get(scope)
+            if bucket is None:
+                if len(self._scopes) >= self.max_scopes:
+                    self._prune(now)
+                bucket = self._scopes[scope] = TokenBucket(self.user_rate, self.user_burst)
+            wait = max(
+                self.blocked_until - now,
+                bucket.reserve(now),
+                self.global_bucket.reserve(now)
+            )
+            if wait > self.max_wait:
+                bucket.refund()
+                self.global_bucket.refund()
+                self.throttled += 1
+                return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def penalize(self, retry_after):
+        """Record a 429 and pause all calls for its Retry-After; returns the pause in seconds."""
+        try:
+            delay = max(1.0, float(retry_after))
+        except (TypeError, ValueError):
+            delay = 1.0
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def backoff(self, attempt, retry_after=None):
+        """Delay before retry number `attempt` (0-based): Retry-After or exponential, plus up to 50% jitter."""
+        base = retry_after if retry_after is not None else 0.25 * 2 ** attempt
+        return base + random.uniform(0, base / 2)
+
+    def throttled_response(self):
+        """A 429 shaped like Spotify's, for calls turned away before reaching it."""
+        with self._lock:
+            retry_after = max(1, int(self.blocked_until - time.monotonic() + 0.999))
+        body = json.dumps({'error': {'status': 429, 'message': 'API rate limit exceeded'}}).encode()
+        return CachedResponse(429, body, {'Content-Type': 'application/json', 'Retry-After': str(retry_after)})
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'scopes': len(self._scopes),
+                'throttled': self.throttled,
+                'blocked_for': max(0.0, round(self.blocked_until - time.monotonic(), 3))
+            }
+
+    def _prune(self, now):
+        """Forget scopes whose buckets have refilled. Caller holds the lock."""
+        for scope, bucket in list(self._scopes.items()):
+            if bucket.is_full(now):
+                del self._scopes[scope]
+
+
+# ------------------------------------------------------------------------
+# 2. Single-Flight: concurrent identical GETs share one upstream request
+# ------------------------------------------------------------------------
+class SingleFlight:
+    """The first caller for a key runs the call; callers arriving meanwhile get its result."""
+
+    def __init__(self):
+        self._calls = {}  # key -> [Event, result, exception]
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, call):
+        with self._lock:
+            entry = self._calls.get(key)
+            leader = entry is None
+            if leader:
+                entry = self._calls[key] = [threading.Event(), None, None]
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            entry[0].wait()
+            if entry[2] is not None:
+                raise entry[2]
+            return entry[1]
+
+        try:
+            entry[1] = call()
+            return entry[1]
+        except Exception as e:
+            entry[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            entry[0].set()
+
+
+rate_limiter = RateLimiter(
+    rate=float(os.getenv('SPOTIFY_RATE_LIMIT', 20)),
+    burst=int(os.getenv('SPOTIFY_RATE_BURST', 40)),
+    user_rate=float(os.getenv('SPOTIFY_USER_RATE_LIMIT', 5)),
+    user_burst=int(os.getenv('SPOTIFY_USER_RATE_BURST', 10)),
+    max_wait=float(os.getenv('SPOTIFY_RATE_MAX_WAIT', 5)),
+    workers=int(os.getenv('SPOTIFY_RATE_WORKERS') or os.getenv('WEB_CONCURRENCY', 1))
+)
+single_flight = SingleFlight()
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+# ------------------------------------------------------------------------
+# 0. Cached Spotify Response:
+# ------------------------------------------------------------------------
+class CachedResponse:
+    """The parts of a requests.Response that handle_response reads."""
+    __slots__ = ('status_code', 'content', 'headers')
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __bool__(self):
+        return True
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# ------------------------------------------------------------------------
+# 1. TTL + LRU Response Cache for Spotify catalog lookups:
+# ------------------------------------------------------------------------
+class ResponseCache:
+    """
+    In-process cache keyed by endpoint path + normalised query string.
+    Entries expire after a per-endpoint TTL and the least recently used
+    ones are evicted once either `max_entries` or `max_bytes` is exceeded.
+    Endpoints without a TTL (and anything under me/) are never cached.
+    """
+
+    def __init__(self, ttls, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, CachedResponse)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, endpoint):
+        """Return the TTL in seconds for `endpoint`, or 0 if it must not be cached."""
+        path = endpoint.split('?', 1)[0].strip('/')
+        if path.startswith('me/') or path == 'me':
+            return 0
+        return self.ttls.get(path.split('/', 1)[0], 0)
+
+    def make_key(self, endpoint):
+        """Normalise `endpoint` so equivalent queries share an entry."""
+        path, _, query = endpoint.partition('?')
+        params = []
+        for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True):
+            if name == 'q':
+                value = ' '.join(value.lower().split())
+            params.append((name, value))
+        return f"{path.strip('/')}?{urllib.parse.urlencode(sorted(params))}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def set(self, key, response, ttl):
+        cached = CachedResponse(response.status_code, response.content, {
+            'Content-Type': response.headers.get('Content-Type', 'application/json')
+        })
+        size = len(cached.content)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, cached)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _remove(self, key):
+        _, response = self._entries.pop(key)
+        self._bytes -= len(response.content)
+
+
+response_cache = ResponseCache(
+    ttls={
+        'search': int(os.getenv('SPOTIFY_CACHE_TTL_SEARCH', 300)),
+        'tracks': int(os.getenv('SPOTIFY_CACHE_TTL_TRACKS', 3600)),
+        'albums': int(os.getenv('SPOTIFY_CACHE_TTL_ALBUMS', 3600)),
+        'artists': int(os.getenv('SPOTIFY_CACHE_TTL_ARTISTS', 3600))
+    },
+    max_entries=int(os.getenv('SPOTIFY_CACHE_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.getenv('SPOTIFY_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+)
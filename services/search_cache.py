@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Types the catalog search accepts, mapped to the key of their block in Spotify's response
+SEARCH_TYPES = {
+    'track': 'tracks',
+    'artist': 'artists',
+    'album': 'albums',
+    'playlist': 'playlists'
+}
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def _words(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def searchable_words(item):
+    """Words a result item can be matched on: its name plus artist / album / owner names."""
+    if not item:
+        return []
+    words = _words(item.get('name'))
+    for artist in item.get('artists') or []:
+        words += _words(artist.get('name'))
+    album = item.get('album')
+    if isinstance(album, dict):
+        words += _words(album.get('name'))
+    owner = item.get('owner')
+    if isinstance(owner, dict):
+        words += _words(owner.get('display_name'))
+    return words
+
+
+def matches(item, terms):
+    """True when every query term is a prefix of one of the item's words."""
+    words = searchable_words(item)
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+# ------------------------------------------------------------------------
+# 0. Prefix (typeahead) cache for catalog search results:
+# ------------------------------------------------------------------------
+class PrefixSearchCache:
+    """
+    Keeps recent catalog results per (type, normalized query) so longer
+    queries can be answered from a shorter one's results.
+    - If the cached prefix result was complete (Spotify's total fitted in
+      the items we kept), filtering it locally is the full answer.
+    - Otherwise the filtered items are only used when at least `min_items`
+      of them are left (a full page); they are a preview the caller should
+      refine upstream. Fewer than that counts as a miss.
+    Entries expire after `ttl` seconds; least recently used ones are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, ttl=300, max_entries=2048, min_prefix=2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_prefix = min_prefix
+        self._entries = OrderedDict()  # (type, query) -> (expires_at, items, total)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def lookup(self, search_type, query, min_items=1):
+        """
+        Return (items, total, complete) for `query`, from an exact entry or the
+        longest cached prefix, or None when nothing usable is cached.
+        """
+        query = normalize_query(query)
+        with self._lock:
+            entry = self._get((search_type, query))
+            if entry is not None:
+                self.hits += 1
+                _, items, total = entry
+                return list(items), total, True
+
+            for end in range(len(query) - 1, self.min_prefix - 1, -1):
+                entry = self._get((search_type, query[:end]))
+                if entry is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+
+        _, items, total = entry
+        terms = _words(query)
+        filtered = [item for item in items if matches(item, terms)]
+        complete = total <= len(items)
+        with self._lock:
+            if not complete and len(filtered) < min_items:
+                # Too little of an incomplete prefix survives the filter to show
+                self.misses += 1
+                return None
+            self.prefix_hits += 1
+        if complete:
+            # A complete superset filtered down is itself complete; remember it as such
+            self.store(search_type, query, filtered, len(filtered))
+        return filtered, len(filtered) if complete else total, complete
+
+    def store(self, search_type, query, items, total):
+        with self._lock:
+            key = (search_type, normalize_query(query))
+            self._entries[key] = (time.monotonic() + self.ttl, list(items), total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'prefix_hits': self.prefix_hits,
+                'misses': self.misses
+            }
+
+    def _get(self, key):
+        """Return a live entry and mark it recently used. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+
+search_cache = PrefixSearchCache(
+    ttl=int(os.getenv('SEARCH_CACHE_TTL', 300)),
+    max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 2048))
+)
@@ -0,0 +1,107 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.http_client import http_client
+
+# ------------------------------------------------------------------------
+# 0. Asyncio Gateway for fanning out Spotify calls:
+# ------------------------------------------------------------------------
+class SpotifyGateway:
+    """
+    Runs independent upstream calls concurrently from synchronous Flask views.
+    - One asyncio event loop lives on a background thread; views hand it a
+      batch with run_all() and block until the slowest call finishes.
+    - The calls themselves are blocking http_client requests, run in the
+      loop's executor, so they share the pooled keep-alive connections.
+    - Concurrency is bounded per process (GATEWAY_MAX_CONCURRENCY) and per
+      user (GATEWAY_PER_USER), so one user's fan-out cannot take every slot.
+    - A batch waits GATEWAY_CALL_TIMEOUT seconds (default: the HTTP client's
+      worst case for one request) per wave of GATEWAY_PER_USER calls, but
+      never more than GATEWAY_TIMEOUT seconds in total, so a view stays
+      inside the web server's own timeout; calls still running after that
+      come back as None.
+    """
+
+    def __init__(self, max_concurrency=16, per_user=4, call_timeout=None, max_timeout=20.0):
+        self.max_concurrency = max_concurrency
+        self.per_user = per_user
+        self.call_timeout = call_timeout or http_client.max_request_seconds
+        self.max_timeout = max_timeout
+        self._loop = None
+        self._started = threading.Lock()
+        self._global = None
+        self._users = {}  # user_id -> [Semaphore, number of calls holding or waiting]
+
+    def run_all(self, user_id, calls, timeout=None):
+        """
+        Run the zero-argument callables in `calls` concurrently and return
+        their results in the same order. An exception from a call is
+        logged and its result is None; so is the result of a call that has
+        not finished when `timeout` (default: sized from call_timeout, capped
+        at max_timeout) runs out.
+        """
+        if not calls:
+            return []
+        if len(calls) == 1:
+            return [self._call_logged(calls[0])]
+        if timeout is None:
+            timeout = min(self.call_timeout * math.ceil(len(calls) / self.per_user), self.max_timeout)
+        loop = self._ensure_loop()
+        futures = [asyncio.run_coroutine_threadsafe(self._bounded(user_id, call), loop) for call in calls]
+        done, pending = concurrent.futures.wait(futures, timeout=timeout)
+        if pending:
+            logging.warning(f"{len(pending)} of {len(calls)} Spotify calls did not finish within {timeout:.1f}s")
+            for future in pending:
+                future.cancel()
+        return [future.result() if future in done else None for future in futures]
+
+    def submit(self, user_id, call):
+        """Schedule one callable without waiting for it; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self._bounded(user_id, call), self._ensure_loop())
+
+    # ------------------------------------------------------------------------
+    # Event loop side
+    # ------------------------------------------------------------------------
+    def _ensure_loop(self):
+        with self._started:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(
+                    ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='spotify-gateway')
+                )
+                threading.Thread(target=loop.run_forever, name='spotify-gateway-loop', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _bounded(self, user_id, call):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        entry = self._users.setdefault(user_id, [asyncio.Semaphore(self.per_user), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._global:
+                return await asyncio.get_running_loop().run_in_executor(None, self._call_logged, call)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._users[user_id]
+
+    def _call_logged(self, call):
+        try:
+            return call()
+        except Exception as e:
+            logging.exception(f"Spotify gateway call failed: {e}")
+            return None
+
+
+spotify_gateway = SpotifyGateway(
+    max_concurrency=int(os.getenv('GATEWAY_MAX_CONCURRENCY', 16)),
+    per_user=int(os.getenv('GATEWAY_PER_USER', 4)),
+    call_timeout=float(os.getenv('GATEWAY_CALL_TIMEOUT', 0)) or None,
+    max_timeout=float(os.getenv('GATEWAY_TIMEOUT', 20))
+)
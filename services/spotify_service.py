@@ -1,11 +1,109 @@
 # services/spotify_service.py
 
-from flask import session, jsonify, request
+from flask import session, jsonify, request, current_app
+import functools
+import json
+import logging
 import requests
+import time
+import urllib.parse
+from datetime import datetime, timezone
 import os
 import base64
-from db import db
-from models import Like, Recent
+from db import db, insert_ignore
+from sqlalchemy import and_, or_
+from models import Like, Recent, SyncCursor
+from services.http_client import http_client
+from queue_manager import TrackRecord, is_track_id
+from services.event_bus import event_bus
+from services.response_cache import response_cache, CachedResponse
+from services.spotify_gateway import spotify_gateway
+from services.rate_limiter import rate_limiter, single_flight
+from services.token_manager import token_manager
+from services.library_search import library_search
+from services.search_cache import search_cache, SEARCH_TYPES
+
+# Spotify's GET /v1/tracks accepts at most this many ids per call
+MAX_TRACKS_PER_REQUEST = 50
+
+# Largest page sizes Spotify allows for /v1/me/tracks and recently-played
+LIKED_PAGE_SIZE = 50
+RECENT_PAGE_SIZE = 50
+# Safety cap on `next` links followed in one recent-plays sync
+RECENT_MAX_PAGES = 10
+
+# Default / maximum page sizes for the local library endpoints
+LIBRARY_PAGE_SIZE = 100
+LIBRARY_MAX_PAGE_SIZE = 500
+# Results returned by a library (local) search
+LIBRARY_SEARCH_LIMIT = 20
+# Results per type fetched from Spotify's catalog search (its maximum, so more
+# prefixes are cached complete) and the number handed to the browser
+SEARCH_FETCH_LIMIT = 50
+SEARCH_LIMIT = 20
+
+# Extra attempts for idempotent GETs that hit a 429 or a transient 5xx
+GET_RETRIES = 2
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Only the columns the library views need, loaded as row tuples instead of ORM objects
+LIKE_COLUMNS = (
+    Like.id, Like.name, Like.artist, Like.album, Like.albumArt,
+    Like.uri, Like.duration_ms, Like.added_at, Like.user_id
+)
+RECENT_COLUMNS = (
+    Recent.id, Recent.name, Recent.artist, Recent.album, Recent.albumArt,
+    Recent.uri, Recent.duration_ms, Recent.played_at, Recent.user_id
+)
+
+class SpotifySyncError(Exception):
+    """Raised inside a sync when Spotify answers with a non-200 status."""
+
+    def __init__(self, status_code):
+        super().__init__(f'Spotify returned {status_code}')
+        self.status_code = status_code
+
+
+def _utcnow():
+    """Naive UTC timestamp, matching the DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _serialize_row(row):
+    """Turn a projected row tuple into the dict shape the front end expects."""
+    track = row._asdict()
+    for key in ('added_at', 'played_at'):
+        if track.get(key) is not None:
+            track[key] = track[key].isoformat()
+    return track
+
+
+def _encode_cursor(timestamp, track_id):
+    """Opaque keyset cursor for the library endpoints."""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, track_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, track_id = json.loads(raw)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), track_id
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _parse_spotify_time(value):
+    """Parse Spotify's ISO-8601 timestamps ('2024-01-01T12:00:00Z') into naive UTC; raises ValueError/TypeError."""
+    if not value:
+        return None
+    if not isinstance(value, str):
+        raise TypeError(f'Expected an ISO-8601 string, got {value!r}')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 class SpotifyService:
     def __init__(self):
@@ -16,64 +114,238 @@ class SpotifyService:
     # 0. Example: Searching Spotify (Existing Logic)
     # ------------------------------------------------------------------------
     def search(self, query, search_type='track'):
-        """Searches Spotify's catalog for the given query."""
-        endpoint = f"search?q={query}&type={search_type}"
-        response = self.spotify_api_call(endpoint, method='GET', player_related=False)
-        return self.handle_response(response)
+        """
+        Searches Spotify's catalog for the given query, typeahead-style.
+        `search_type` may list several types ("track,artist"); every type not
+        answerable from the prefix cache is fetched in one upstream call.
+        An incomplete cached prefix is only used when a full page of its
+        results still matches; those types are returned right away
+        (X-Search-Partial: true) and refined in the background, and a
+        'search' event tells the client to ask again. Unknown types are a 400.
+        """
+        types = list(dict.fromkeys(search_type.split(',')))
+        unknown = [t for t in types if t not in SEARCH_TYPES]
+        if unknown:
+            return jsonify({'error': f"Unknown search type: {', '.join(unknown)}"}), 400
+        access_token = token_manager.for_session()
+        results, missing, refine = {}, [], []
+        for kind in types:
+            cached = search_cache.lookup(kind, query, min_items=SEARCH_LIMIT)
+            if cached is None:
+                missing.append(kind)
+                continue
+            items, total, complete = cached
+            results[SEARCH_TYPES[kind]] = {'items': items, 'total': total}
+            if not complete:
+                refine.append(kind)
+
+        if missing:
+            response = self._catalog_search(query, missing, access_token)
+            if not response or response.status_code != 200:
+                return self.handle_response(response)
+            results.update(response.json())
+
+        for block in results.values():
+            block['items'] = block['items'][:SEARCH_LIMIT]
+            block['limit'], block['offset'] = SEARCH_LIMIT, 0
+        if refine:
+            spotify_gateway.submit(session.get('user_id'), functools.partial(
+                self._refine_search, session.get('user_id'), query, refine, access_token
+            ))
+
+        result = jsonify(results)
+        result.headers['X-Search-Partial'] = 'true' if refine else 'false'
+        return result, 200
+
+    def _catalog_search(self, query, types, access_token):
+        """One upstream search for all `types`; each type's block is stored in the prefix cache."""
+        endpoint = 'search?' + urllib.parse.urlencode({'q': query, 'type': ','.join(types), 'limit': SEARCH_FETCH_LIMIT})
+        response = self.spotify_api_call(endpoint, 'GET', player_related=False, access_token=access_token)
+        if response and response.status_code == 200:
+            data = response.json()
+            for kind in types:
+                block = data.get(SEARCH_TYPES[kind]) or {}
+                search_cache.store(kind, query, [item for item in block.get('items', []) if item], block.get('total', 0))
+        return response
+
+    def _refine_search(self, user_id, query, types, access_token):
+        response = self._catalog_search(query, types, access_token)
+        if user_id and response and response.status_code == 200:
+            event_bus.publish(user_id, 'search', {'query': query, 'types': types})
+
+    def search_library(self, query, search_type='track', limit=LIBRARY_SEARCH_LIMIT):
+        """
+        Prefix search over the session user's liked and recent tracks, answered
+        locally (no Spotify call). Same response shape as the catalog search;
+        only tracks are indexed, so other types come back empty.
+        """
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+
+        results = {}
+        for kind in search_type.split(','):
+            items = []
+            if kind == 'track':
+                track_ids = library_search.search(user_id, query, limit)
+                found = self._local_tracks(user_id, track_ids)
+                items = [found[track_id] for track_id in track_ids if track_id in found]
+            results[f'{kind}s'] = {'items': items, 'total': len(items), 'limit': limit, 'offset': 0}
+        return jsonify(results), 200
 
     # ------------------------------------------------------------------------
     # 1. Liked Tracks: Syncs the User's Liked Songs from Spotify ---> DB
     # ------------------------------------------------------------------------
     def sync_liked_tracks_from_spotify(self):
         """
-        Fetch user's liked tracks from Spotify's /v1/me/tracks and upsert 
-        them into our local 'liked_songs' table (Like model).
+        Sync the session user's liked tracks from Spotify's /v1/me/tracks
+        into our local 'liked_songs' table (Like model).
         """
-        # 1. Check session
         user_id = session.get('user_id')
-        access_token = session.get('oauth_token', {}).get('access_token')
+        access_token = token_manager.for_session()
         if not user_id or not access_token:
             return jsonify({'error': 'User not authenticated'}), 401
 
-        # 2. Hit Spotify's endpoint
-        url = 'https://api.spotify.com/v1/me/tracks?limit=5'
-        headers = {'Authorization': f'Bearer {access_token}'}
-        resp = requests.get(url, headers=headers)
-        
-        if resp.status_code != 200:
-            return jsonify({'error': 'Failed to fetch liked tracks'}), resp.status_code
+        result, status_code = self.sync_liked_tracks(user_id, access_token)
+        return jsonify(result), status_code
 
-        data = resp.json()
-        items = data.get('items', [])
+    def sync_liked_tracks(self, user_id, access_token):
+        """
+        Incrementally sync a user's liked tracks; returns (dict, status_code).
+
+        Pages through /v1/me/tracks newest-first at the maximum page size and
+        stops at the first item at or before the stored `added_at` watermark.
+        Each page is written with one insert-or-ignore. If the number of
+        likes confirmed on Spotify then disagrees with Spotify's total (minus
+        items we cannot store, such as local files without an id), a full
+        pass runs and confirmed rows Spotify no longer has are deleted.
+        In-app likes whose mirror to Spotify is still pending (or failed)
+        are never deleted by a sync.
+        """
+        cursor = db.session.get(SyncCursor, (user_id, 'liked')) or SyncCursor(user_id=user_id, kind='liked')
+        watermark, unstorable = self._decode_liked_cursor(cursor.cursor)
 
-        # 3. Insert or update local DB
-        for item in items:
-            track = item.get('track', {})
-            track_id = track.get('id')
+        try:
+            newest, total, seen_ids, inserted, skipped = self._walk_liked_pages(user_id, access_token, watermark)
+            unstorable = skipped if watermark is None else unstorable + skipped
+            removed = 0
+            confirmed = Like.query.filter_by(user_id=user_id, mirrored=True).count()
+            if total is not None and confirmed != total - unstorable:
+                if watermark is not None:
+                    _, total, seen_ids, more, unstorable = self._walk_liked_pages(user_id, access_token, None)
+                    inserted += more
+                removed = self._delete_liked_except(user_id, seen_ids)
+        except SpotifySyncError as e:
+            db.session.rollback()
+            return {'error': 'Failed to fetch liked tracks'}, e.status_code
 
-            if not track_id:
-                continue
+        if newest and (watermark is None or newest > watermark):
+            watermark = newest
+        cursor.cursor = self._encode_liked_cursor(watermark, unstorable)
+        cursor.synced_at = _utcnow()
+        db.session.add(cursor)
+        db.session.commit()
+        return {
+            'message': 'Synced liked tracks from Spotify to local DB',
+            'inserted': inserted,
+            'removed': removed
+        }, 200
+
+    @staticmethod
+    def _decode_liked_cursor(value):
+        """The liked cursor is '<newest added_at>|<items without a storable id>'; returns (watermark, count)."""
+        if not value:
+            return None, 0
+        watermark, _, unstorable = value.partition('|')
+        return datetime.fromisoformat(watermark), int(unstorable or 0)
+
+    @staticmethod
+    def _encode_liked_cursor(watermark, unstorable):
+        if watermark is None:
+            return None
+        return f'{watermark.isoformat()}|{unstorable}'
 
-            existing = Like.query.filter_by(id=track_id, user_id=user_id).first()
-            if not existing:
-                new_like = Like(
-                    id=track_id,
-                    user_id=user_id,
-                    name=track.get('name', 'Unknown'),
-                    artist=', '.join(artist['name'] for artist in track.get('artists', [])),
-                    album=track.get('album', {}).get('name', 'Unknown Album'),
-                    albumArt=self._extract_album_art(track),
-                    uri=track.get('uri'),
-                    duration_ms=track.get('duration_ms', 0)
-                )
-                db.session.add(new_like)
+    def _walk_liked_pages(self, user_id, access_token, watermark):
+        """
+        Walk /v1/me/tracks until the end or the watermark, inserting unseen
+        tracks page by page. Returns (newest added_at, Spotify total, ids seen,
+        inserted, items skipped because they have no id or a malformed added_at).
+        """
+        newest, total, seen_ids, inserted, skipped = None, None, set(), 0, 0
+        offset = 0
+        while True:
+            response = self.spotify_api_call(
+                f'me/tracks?limit={LIKED_PAGE_SIZE}&offset={offset}', 'GET', access_token=access_token
+            )
+            if not response:
+                raise SpotifySyncError(502)
+            if response.status_code != 200:
+                raise SpotifySyncError(response.status_code)
+
+            data = response.json()
+            total = data.get('total', total)
+            items = data.get('items', [])
+
+            page = {}
+            reached_watermark = False
+            for item in items:
+                track = item.get('track') or {}
+                try:
+                    added_at = _parse_spotify_time(item.get('added_at'))
+                except (TypeError, ValueError):
+                    logging.warning(f"Skipping liked track with malformed added_at: {item.get('added_at')!r}")
+                    skipped += 1
+                    continue
+                if watermark is not None and added_at is not None and added_at <= watermark:
+                    reached_watermark = True
+                    break
+                if not track.get('id'):
+                    # Local files have no Spotify id; they still count towards Spotify's total
+                    skipped += 1
+                    continue
+                if newest is None or (added_at and added_at > newest):
+                    newest = added_at
+                seen_ids.add(track['id'])
+                page.setdefault(track['id'], dict(self._track_fields(track), id=track['id'], added_at=added_at))
+
+            inserted += self._insert_new_likes(user_id, page)
+            db.session.commit()
+
+            offset += len(items)
+            if reached_watermark or not items or not data.get('next'):
+                return newest, total, seen_ids, inserted, skipped
+
+    def _insert_new_likes(self, user_id, rows_by_id):
+        """
+        Insert the rows the user has not liked yet (insert-or-ignore, so a
+        racing sync or like is harmless) and mark the ones already present
+        as confirmed on Spotify. Returns the count inserted.
+        """
+        if not rows_by_id:
+            return 0
+        inserted = insert_ignore(
+            Like, [dict(row, user_id=user_id, mirrored=True) for row in rows_by_id.values()], ['user_id', 'id']
+        )
+        Like.query.filter(
+            Like.user_id == user_id, Like.id.in_(rows_by_id), Like.mirrored.is_(False)
+        ).update({'mirrored': True}, synchronize_session=False)
+        return inserted
+
+    def _delete_liked_except(self, user_id, keep_ids):
+        """Delete the user's confirmed liked rows whose ids are not in `keep_ids`."""
+        local_ids = {
+            track_id for (track_id,) in
+            db.session.query(Like.id).filter_by(user_id=user_id, mirrored=True)
+        }
+        stale = list(local_ids - keep_ids)
+        for i in range(0, len(stale), 500):
+            Like.query.filter(Like.user_id == user_id, Like.id.in_(stale[i:i + 500])).delete(synchronize_session=False)
+        return len(stale)
 
-        db.session.commit()
-        return jsonify({'message': 'Synced liked tracks from Spotify to local DB'}), 200
-    
     def toggle_like_track(self, track_data):
         """
-        Toggle the like state of a track. Adds a new entry if not liked.
+        Like a track with a single INSERT ... ON CONFLICT DO NOTHING, so
+        repeated or racing clicks are harmless. Mirrored to Spotify in the background.
         """
         user_id = session.get('user_id')  
         track_id = track_data.get('id')
@@ -81,138 +353,316 @@ class SpotifyService:
         if not user_id or not track_id:
             return {'error': 'User not authenticated or invalid track ID'}, 401
 
-        # Checks if the track is already liked
-        existing_like = Like.query.filter_by(id=track_id, user_id=user_id).first()
-        if existing_like:
-            return {'message': 'Track already liked', 'liked': True}, 200
-
         try:
-            # Extracts the artist names
-            artist_names = ', '.join(
-                artist.get('name', 'Unknown Artist') for artist in track_data.get('artists', [])
-            ) or track_data.get('artist', 'Unknown Artist') 
-
-            # Extracts the album data
-            album = track_data.get('album', {})
-            album_name = album.get('name', 'Unknown Album') if isinstance(album, dict) else album
-            album_art = (
-                album.get('images', [{}])[0].get('url', '') if isinstance(album, dict) else track_data.get('albumArt', '')
-            )
-
-            # Formats the data for a new transaction into the liked_songs table
-            new_like = Like(
-                id=track_id,
-                user_id=user_id,
-                name=track_data.get('name', 'Unknown'),
-                artist=artist_names,
-                album=album_name,
-                albumArt=album_art,
-                uri=track_data.get('uri', ''),
-                duration_ms=track_data.get('duration_ms', 0)
-            )
-            db.session.add(new_like)
+            inserted = self.like_tracks(user_id, [track_data])
             db.session.commit()
-            return {'message': 'Track liked', 'liked': True}, 200
-
         except Exception as e:
             db.session.rollback()
             return {'error': 'Failed to like track'}, 500
 
-
+        self.mirror_library_change([track_id], liked=True)
+        if not inserted:
+            return {'message': 'Track already liked', 'liked': True}, 200
+        return {'message': 'Track liked', 'liked': True}, 200
 
     def toggle_unlike_track(self, track_id):
         """
-        Toggle the unlike state of a track. Removes the entry if liked.
+        Unlike a track with a single DELETE; a missing row is not an error.
+        Mirrored to Spotify in the background.
         """
         user_id = session.get('user_id')
 
         if not user_id or not track_id:
             return {'error': 'User not authenticated or invalid track ID'}, 401
 
-        # Check if track is already liked
-        existing_like = Like.query.filter_by(id=track_id, user_id=user_id).first()
+        try:
+            removed = self.unlike_tracks(user_id, [track_id])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return {'error': 'Failed to unlike track'}, 500
 
-        if not existing_like:
+        self.mirror_library_change([track_id], liked=False)
+        if not removed:
             return {'message': 'Track not liked', 'liked': False}, 200
+        return {'message': 'Track unliked', 'liked': False}, 200
 
+    def apply_like_batch(self, ops):
+        """
+        Apply queued like/unlike toggles in one transaction.
+        `ops` is a list of {'id', 'liked': bool, 'track': {...}}; when an id
+        appears more than once the last toggle wins.
+        """
+        user_id = session.get('user_id')
+        if not user_id:
+            return {'error': 'User not authenticated'}, 401
+
+        final = {}
+        for op in ops:
+            if not isinstance(op, dict) or not isinstance(op.get('track') or {}, dict):
+                return {'error': 'Each op must be an object and its track an object'}, 400
+            track = op.get('track') or {}
+            track_id = op.get('id') or track.get('id')
+            if not is_track_id(track_id) or not isinstance(op.get('liked'), bool):
+                return {'error': 'Each op needs an id and a boolean liked'}, 400
+            final[track_id] = (op['liked'], dict(track, id=track_id))
+
+        to_like = [track for liked, track in final.values() if liked]
+        to_unlike = [track_id for track_id, (liked, _) in final.items() if not liked]
         try:
-            # Remove the liked track
-            db.session.delete(existing_like)
+            liked_count = self.like_tracks(user_id, to_like)
+            unliked_count = self.unlike_tracks(user_id, to_unlike)
             db.session.commit()
-            return {'message': 'Track unliked', 'liked': False}, 200
         except Exception as e:
             db.session.rollback()
-            return {'error': 'Failed to unlike track'}, 500
+            return {'error': 'Failed to apply like changes'}, 500
+
+        self.mirror_library_change([track['id'] for track in to_like], liked=True)
+        self.mirror_library_change(to_unlike, liked=False)
+        return {
+            'message': 'Like changes applied',
+            'liked': liked_count,
+            'unliked': unliked_count,
+            'state': {track_id: liked for track_id, (liked, _) in final.items()}
+        }, 200
+
+    def like_tracks(self, user_id, tracks):
+        """
+        Insert likes for `tracks` in one statement, skipping ones already liked.
+        Tracks sent without name/artist/album are described from the user's
+        rows or /v1/tracks first; one Spotify cannot describe is not stored
+        here, the next liked sync adds it once the like reaches Spotify. Caller commits.
+        """
+        records = [record for record in map(TrackRecord.from_raw, tracks) if record is not None]
+        bare = [record.id for record in records if not (record.name and record.artist and record.album)]
+        if bare:
+            described = self._describe_tracks(user_id, bare)
+            records = [described.get(record.id) if record.id in bare else record for record in records]
+
+        now = _utcnow()
+        rows = []
+        for record in records:
+            if record is None:
+                continue
+            rows.append({
+                'id': record.id,
+                'user_id': user_id,
+                'name': record.name,
+                'artist': record.artist,
+                'album': record.album,
+                'albumArt': record.albumArt,
+                'uri': record.uri,
+                'duration_ms': record.duration_ms,
+                'added_at': now,
+                'mirrored': False
+            })
+        return insert_ignore(Like, rows, ['user_id', 'id'])
+
+    def _describe_tracks(self, user_id, track_ids):
+        """TrackRecords for `track_ids` from the user's rows, the catalog cache or /v1/tracks; unknown ids are left out."""
+        found = self._local_tracks(user_id, track_ids)
+        missing = []
+        for track_id in track_ids:
+            if track_id in found:
+                continue
+            cached = response_cache.get(response_cache.make_key(f'tracks/{track_id}'))
+            if cached is not None:
+                found[track_id] = cached.json()
+            else:
+                missing.append(track_id)
 
-    
-    def fetch_liked_tracks(self, user_id):
+        access_token = token_manager.for_session() if missing else None
+        for i in range(0, len(missing) if access_token else 0, MAX_TRACKS_PER_REQUEST):
+            chunk = missing[i:i + MAX_TRACKS_PER_REQUEST]
+            response = self.spotify_api_call(
+                f"tracks?ids={','.join(chunk)}", 'GET', player_related=False, access_token=access_token
+            )
+            if response is None or response.status_code != 200:
+                logging.warning(f"Could not describe {len(chunk)} liked tracks for user {user_id}")
+                continue
+            for track in response.json().get('tracks', []):
+                if track:
+                    found[track['id']] = track
+
+        records = {}
+        for track_id, track in found.items():
+            record = TrackRecord.from_raw(track)
+            if record is not None and record.name and record.artist and record.album:
+                records[track_id] = record
+        return records
+
+    def unlike_tracks(self, user_id, track_ids):
+        """Delete the user's likes for `track_ids` in one statement. Caller commits."""
+        if not track_ids:
+            return 0
+        return Like.query.filter(Like.user_id == user_id, Like.id.in_(track_ids)).delete(synchronize_session=False)
+
+    def mirror_library_change(self, track_ids, liked, access_token=None):
         """
-        Fetches the User's Liked_Tracks from the local database
+        Save/remove the tracks in the user's Spotify library without blocking
+        the request. Saved likes are marked `mirrored` once Spotify accepts them.
         """
-        liked_tracks = Like.query.filter_by(user_id=user_id).all()
-        return [track.to_dict() for track in liked_tracks]
+        if access_token is None:
+            access_token = token_manager.for_session()
+        if not track_ids or not access_token:
+            return
+        method = 'PUT' if liked else 'DELETE'
+        user_id = session.get('user_id')
+        app = current_app._get_current_object()
+        for i in range(0, len(track_ids), MAX_TRACKS_PER_REQUEST):
+            chunk = track_ids[i:i + MAX_TRACKS_PER_REQUEST]
+            spotify_gateway.submit(user_id, functools.partial(self._mirror_chunk, app, user_id, chunk, method, access_token))
+
+    def _mirror_chunk(self, app, user_id, track_ids, method, access_token):
+        response = self.spotify_api_call(f"me/tracks?ids={','.join(track_ids)}", method, access_token=access_token)
+        if not response or response.status_code not in (200, 204):
+            status_code = response.status_code if response else 'no response'
+            logging.warning(f"Mirroring {method} me/tracks to Spotify failed: {status_code}")
+            return
+        if method == 'PUT':
+            with app.app_context():
+                Like.query.filter(
+                    Like.user_id == user_id, Like.id.in_(track_ids)
+                ).update({'mirrored': True}, synchronize_session=False)
+                db.session.commit()
+
+    def fetch_liked_tracks(self, user_id, limit=LIBRARY_PAGE_SIZE, cursor=None):
+        """
+        Fetches one page of the User's Liked_Tracks from the local database,
+        newest first. Returns (tracks, next_cursor); next_cursor is None on the last page.
+        Keyset-paginated on (added_at, id) and projected to plain column tuples;
+        limit=None returns every row. Raises ValueError for a malformed cursor.
+        """
+        query = db.session.query(*LIKE_COLUMNS).filter(Like.user_id == user_id)
+        if cursor:
+            added_at, track_id = _decode_cursor(cursor)
+            if not isinstance(track_id, str):
+                raise ValueError('Invalid cursor')
+            if added_at is not None:
+                query = query.filter(or_(
+                    Like.added_at < added_at,
+                    and_(Like.added_at == added_at, Like.id < track_id),
+                    Like.added_at.is_(None)
+                ))
+            else:
+                query = query.filter(Like.added_at.is_(None), Like.id < track_id)
+
+        query = query.order_by(Like.added_at.desc().nullslast(), Like.id.desc())
+        if limit is None:
+            return [_serialize_row(row) for row in query.all()], None
+        rows = query.limit(limit + 1).all()
+        tracks = [_serialize_row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = _encode_cursor(last.added_at, last.id)
+        return tracks, next_cursor
 
     # ------------------------------------------------------------------------
     # 2. Recently Played: Syncs the User's Recent Track History from Spotify ---> DB
     # ------------------------------------------------------------------------
     def sync_recent_tracks_from_spotify(self):
         """
-        Fetch user's recently played tracks from Spotify's 
-        /v1/me/player/recently-played and upsert them into 'recently_played' table.
+        Sync the session user's recently played tracks from Spotify's
+        /v1/me/player/recently-played into the 'recently_played' table.
         """
         user_id = session.get('user_id')
-        access_token = session.get('oauth_token', {}).get('access_token')
+        access_token = token_manager.for_session()
         if not user_id or not access_token:
             return jsonify({'error': 'User not authenticated'}), 401
 
-        url = 'https://api.spotify.com/v1/me/player/recently-played?limit=5'
-        headers = {'Authorization': f'Bearer {access_token}'}
-    
-        resp = requests.get(url, headers=headers)
-
-        if resp.status_code != 200:
-            return jsonify({'error': 'Failed to fetch recent tracks'}), resp.status_code
-
-        data = resp.json()
-        items = data.get('items', [])
+        result, status_code = self.sync_recent_tracks(user_id, access_token)
+        return jsonify(result), status_code
 
-        for item in items:
-            track = item.get('track', {})
-            track_id = track.get('id')
+    def sync_recent_tracks(self, user_id, access_token):
+        """
+        Append the user's new plays to 'recently_played'; returns (dict, status_code).
 
-            if not track_id:
-                continue
+        Fetches only plays after the stored cursor (Spotify's `after`, in ms),
+        following `next` links, and writes each page with a single
+        INSERT ... ON CONFLICT DO NOTHING keyed on (user_id, played_at).
+        """
+        cursor = db.session.get(SyncCursor, (user_id, 'recent')) or SyncCursor(user_id=user_id, kind='recent')
+        after = int(cursor.cursor) if cursor.cursor else None
+
+        endpoint = f'me/player/recently-played?limit={RECENT_PAGE_SIZE}'
+        if after is not None:
+            endpoint += f'&after={after}'
+
+        inserted = 0
+        for _ in range(RECENT_MAX_PAGES):
+            response = self.spotify_api_call(endpoint, 'GET', access_token=access_token)
+            if not response or response.status_code != 200:
+                db.session.rollback()
+                status_code = response.status_code if response else 502
+                return {'error': 'Failed to fetch recent tracks'}, status_code
+
+            data = response.json()
+            rows = []
+            for item in data.get('items', []):
+                track = item.get('track') or {}
+                try:
+                    played_at = _parse_spotify_time(item.get('played_at'))
+                except (TypeError, ValueError):
+                    logging.warning(f"Skipping play with malformed played_at: {item.get('played_at')!r}")
+                    continue
+                if not track.get('id') or played_at is None:
+                    continue
+                rows.append(dict(self._track_fields(track), id=track['id'], user_id=user_id, played_at=played_at))
+                played_ms = int(played_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+                after = played_ms if after is None else max(after, played_ms)
+
+            inserted += insert_ignore(Recent, rows, ['user_id', 'played_at'])
+
+            next_url = data.get('next')
+            if not rows or not next_url:
+                break
+            endpoint = next_url.split('/v1/', 1)[-1]
+
+        if after is not None:
+            cursor.cursor = str(after)
+        cursor.synced_at = _utcnow()
+        db.session.add(cursor)
+        db.session.commit()
 
-            existing = Recent.query.filter_by(id=track_id, user_id=user_id).first()
-            if not existing:
-                new_recent = Recent(
-                    id=track_id,
-                    user_id=user_id,
-                    name=track.get('name', 'Unknown'),
-                    artist=', '.join(artist['name'] for artist in track.get('artists', [])),
-                    album=track.get('album', {}).get('name', 'Unknown Album'),
-                    albumArt=self._extract_album_art(track),
-                    uri=track.get('uri'),
-                    duration_ms=track.get('duration_ms', 0)
-                )
-                db.session.add(new_recent)
+        return {'message': 'Synced recent tracks from Spotify to local DB', 'inserted': inserted}, 200
 
-        db.session.commit()
+    def last_synced(self, user_id, kind):
+        """When `kind` ('liked' / 'recent') was last synced for the user, or None."""
+        return db.session.query(SyncCursor.synced_at).filter_by(user_id=user_id, kind=kind).scalar()
 
-        return jsonify({'message': 'Synced recent tracks from Spotify to local DB'}), 200
-    
-    
-    def fetch_recent_tracks(self, user_id):
+    def fetch_recent_tracks(self, user_id, limit=LIBRARY_PAGE_SIZE, cursor=None):
         """
-        Fetches the User's Liked_Tracks from the local database
+        Fetches one page of the User's Recently Played tracks (newest play first)
+        from the local database. Returns (tracks, next_cursor), keyset-paginated on played_at;
+        limit=None returns every row. Raises ValueError for a malformed cursor.
         """
-        recent_tracks = Recent.query.filter_by(user_id=user_id).all()
-        return [track.to_dict() for track in recent_tracks]
+        query = db.session.query(*RECENT_COLUMNS).filter(Recent.user_id == user_id)
+        if cursor:
+            played_at, _ = _decode_cursor(cursor)
+            if played_at is None:
+                # Every play has a time; `played_at < NULL` would silently match nothing
+                raise ValueError('Invalid cursor')
+            query = query.filter(Recent.played_at < played_at)
+
+        query = query.order_by(Recent.played_at.desc())
+        if limit is None:
+            return [_serialize_row(row) for row in query.all()], None
+        rows = query.limit(limit + 1).all()
+        tracks = [_serialize_row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(rows[limit - 1].played_at, None)
+        return tracks, next_cursor
 
     # ------------------------------------------------------------------------
     # 3. Playback Controls & Other Existing Logic
     # ------------------------------------------------------------------------
-    def play_song(self, data):
+    def play_song(self, data, access_token=None, user_id=None):
+        """
+        Play `data['song_id']` from `data['timestamp']` ms. Pass `access_token`
+        and `user_id` when calling outside a request (the autoplay scheduler).
+        """
         song_id = data.get('song_id')
         timestamp = data.get('timestamp', 0)
         if not song_id:
@@ -222,25 +672,102 @@ class SpotifyService:
             'uris': [f'spotify:track:{song_id}'],
             'position_ms': int(timestamp)
         }
-        response = self.spotify_api_call('me/player/play', 'PUT', body=body)
-        return self.handle_response(response)
+        response = self.spotify_api_call('me/player/play', 'PUT', body=body, access_token=access_token)
+        return self._playback_response(response, 'play', user_id=user_id, track_id=song_id, position_ms=int(timestamp))
 
     def pause_song(self):
         response = self.spotify_api_call('me/player/pause', 'PUT')
-        return self.handle_response(response)
+        return self._playback_response(response, 'pause')
 
     def next_song(self):
         response = self.spotify_api_call('me/player/next', 'POST')
-        return self.handle_response(response)
+        return self._playback_response(response, 'next')
 
     def previous_song(self):
         response = self.spotify_api_call('me/player/previous', 'POST')
-        return self.handle_response(response)
+        return self._playback_response(response, 'previous')
 
     def get_track(self, track_id):
         response = self.spotify_api_call(f'tracks/{track_id}', 'GET', player_related=False)
         return self.handle_response(response)
 
+    def get_multiple_tracks(self, track_ids):
+        """
+        Fetch many tracks in request order using as few upstream calls as possible:
+        1. tracks already in the user's Like/Recent rows are answered locally,
+        2. then tracks in the catalog cache,
+        3. the rest are fetched in chunks of 50 from /v1/tracks, concurrently
+           through the gateway (so latency is that of the slowest chunk).
+        Unknown ids come back as null, like Spotify's own endpoint.
+        """
+        user_id = session.get('user_id')
+        access_token = token_manager.for_session()
+        if not user_id or not access_token:
+            return jsonify({'error': 'User not authenticated'}), 401
+
+        ordered_ids = list(dict.fromkeys(t.strip() for t in track_ids if t.strip()))
+        found = self._local_tracks(user_id, ordered_ids)
+
+        missing = []
+        for track_id in ordered_ids:
+            if track_id in found:
+                continue
+            cached = response_cache.get(response_cache.make_key(f'tracks/{track_id}'))
+            if cached is not None:
+                found[track_id] = cached.json()
+            else:
+                missing.append(track_id)
+
+        chunks = [
+            missing[i:i + MAX_TRACKS_PER_REQUEST]
+            for i in range(0, len(missing), MAX_TRACKS_PER_REQUEST)
+        ]
+        responses = spotify_gateway.run_all(user_id, [
+            functools.partial(
+                self.spotify_api_call, f"tracks?ids={','.join(chunk)}", 'GET',
+                player_related=False, access_token=access_token
+            )
+            for chunk in chunks
+        ])
+        for response in responses:
+            if response is None:
+                # The gateway gave up waiting (or the call failed outright)
+                return jsonify({'error': 'Spotify did not respond in time'}), 504
+            if response.status_code != 200:
+                return self.handle_response(response)
+            for track in response.json().get('tracks', []):
+                if not track:
+                    continue
+                found[track['id']] = track
+                response_cache.set(
+                    response_cache.make_key(f"tracks/{track['id']}"),
+                    CachedResponse(200, json.dumps(track).encode()),
+                    response_cache.ttl_for('tracks')
+                )
+
+        return jsonify({'tracks': [found.get(track_id) for track_id in ordered_ids]}), 200
+
+    def _local_tracks(self, user_id, track_ids):
+        """Build Spotify-shaped track objects from the user's Like/Recent rows."""
+        found = {}
+        if not track_ids:
+            return found
+        for model in (Like, Recent):
+            rows = model.query.filter(model.user_id == user_id, model.id.in_(track_ids)).all()
+            for row in rows:
+                found.setdefault(row.id, {
+                    'id': row.id,
+                    'uri': row.uri,
+                    'name': row.name,
+                    'duration_ms': row.duration_ms,
+                    'artists': [{'name': row.artist}],
+                    'album': {
+                        'name': row.album,
+                        'images': [{'url': row.albumArt}] if row.albumArt else []
+                    }
+                })
+        return found
+
     def get_active_device(self):
         """Retrieve the active Spotify device."""
         response = self.spotify_api_call('me/player/devices', 'GET')
@@ -265,6 +792,8 @@ class SpotifyService:
         Args:
             data (dict): A dictionary containing 'device_ids' (list) or 'device_id' (str),
                          and an optional 'play' (bool) to start playback immediately.
+                         With 'song_id' (and optional 'timestamp') that track is
+                         started on the device instead (see _play_on_device).
                          
         Returns:
             Flask Response: JSON response indicating success or failure.
@@ -283,19 +812,49 @@ class SpotifyService:
         else:
             return jsonify({'error': 'No device ID provided.'}), 400
 
+        if data.get('song_id'):
+            return self._play_on_device(device_ids[0], data['song_id'], int(data.get('timestamp', 0)))
+
         payload = {
             "device_ids": device_ids,
             "play": play
         }
 
         response = self.spotify_api_call('me/player', 'PUT', body=payload)
-        return self.handle_response(response)
+        return self._playback_response(response, 'transfer', device_ids=device_ids, play=play)
+
+    def _play_on_device(self, device_id, song_id, position_ms):
+        """
+        Transfer and play in one upstream call (me/player/play?device_id=),
+        with the device lookup for the response issued alongside it.
+        """
+        access_token = token_manager.for_session()
+        body = {'uris': [f'spotify:track:{song_id}'], 'position_ms': position_ms}
+        play_response, devices_response = spotify_gateway.run_all(session.get('user_id'), [
+            functools.partial(
+                self.spotify_api_call, f'me/player/play?device_id={device_id}', 'PUT', body=body, access_token=access_token
+            ),
+            functools.partial(self.spotify_api_call, 'me/player/devices', 'GET', access_token=access_token)
+        ])
+        result, status_code = self._playback_response(
+            play_response, 'play', track_id=song_id, position_ms=position_ms, device_id=device_id
+        )
+        if status_code == 200 and devices_response is not None and devices_response.status_code == 200:
+            devices = devices_response.json().get('devices', [])
+            device = next((d for d in devices if d.get('id') == device_id), None)
+            return jsonify({'message': 'Action completed successfully', 'device': device}), 200
+        return result, status_code
 
     # ------------------------------------------------------------------------
     # 5. Spotify API Helper: making calls with the user's token
     # ------------------------------------------------------------------------
-    def spotify_api_call(self, endpoint, method='POST', body=None, player_related=True):
-        access_token = session.get('oauth_token', {}).get('access_token')
+    def spotify_api_call(self, endpoint, method='POST', body=None, player_related=True, access_token=None):
+        """
+        Call the Spotify Web API. `access_token` defaults to the session's token;
+        pass it explicitly when calling from outside a request (worker threads).
+        """
+        if access_token is None:
+            access_token = token_manager.for_session()
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
@@ -304,20 +863,56 @@ class SpotifyService:
         base_url = 'https://api.spotify.com/v1/'
         url = f'{base_url}{endpoint}'
         
-        try:
-            if method == 'POST':
-                response = requests.post(url, headers=headers, json=body)
-            elif method == 'PUT':
-                response = requests.put(url, headers=headers, json=body)
-            elif method == 'GET':
-                response = requests.get(url, headers=headers)
-            else:
-                return None  # or handle other HTTP methods
-            return response
-        except requests.RequestException as e:
-            print(f"Request to Spotify API failed: {e}")
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
             return None
 
+        # Catalog GETs are shared across users; player endpoints always go upstream
+        cache_ttl = 0 if player_related or method != 'GET' else response_cache.ttl_for(endpoint)
+        if cache_ttl:
+            cache_key = response_cache.make_key(endpoint)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        scope = rate_limiter.scope_for(access_token)
+        send = functools.partial(self._send, method, url, headers, body, scope)
+        if method == 'GET':
+            # Identical in-flight GETs share one upstream call (catalog ones across users)
+            response = single_flight.do(f"{'catalog' if cache_ttl else scope}:{endpoint}", send)
+        else:
+            response = send()
+
+        if response is not None and cache_ttl and response.status_code == 200:
+            response_cache.set(cache_key, response, cache_ttl)
+        return response
+
+    def _send(self, method, url, headers, body, scope):
+        """
+        One upstream request, paced by the global and per-user rate limiter.
+        GETs are retried with jittered backoff after a 429 (honoring
+        Retry-After) or a transient 5xx; other methods are never retried.
+        """
+        attempts = 1 + (GET_RETRIES if method == 'GET' else 0)
+        for attempt in range(attempts):
+            if not rate_limiter.acquire(scope):
+                return rate_limiter.throttled_response()
+            try:
+                response = http_client.request(method, url, headers=headers, json=body)
+            except requests.RequestException as e:
+                print(f"Request to Spotify API failed: {e}")
+                return None
+
+            if response.status_code not in RETRYABLE_STATUS:
+                return response
+            retry_after = None
+            if response.status_code == 429:
+                retry_after = rate_limiter.penalize(response.headers.get('Retry-After'))
+            delay = rate_limiter.backoff(attempt, retry_after)
+            if attempt + 1 == attempts or delay > rate_limiter.max_wait:
+                return response
+            time.sleep(delay)
+        return response
+
     # ------------------------------------------------------------------------
     # 6. Response Handling
     # ------------------------------------------------------------------------
@@ -327,7 +922,13 @@ class SpotifyService:
         if response.status_code == 204:
             return jsonify({'message': 'Action completed successfully'}), 200
         elif response.status_code == 200:
-            return jsonify(response.json()), 200
+            # Forward Spotify's JSON as-is instead of decoding and re-encoding it
+            return current_app.response_class(response.content, mimetype='application/json'), 200
+        elif response.status_code == 429:
+            # Tell the browser when to come back instead of letting it retry straight away
+            result = jsonify({'error': 'Rate limited by Spotify', 'status_code': 429})
+            result.headers['Retry-After'] = response.headers.get('Retry-After', '1')
+            return result, 429
         else:
             return jsonify({
                 'error': 'Action failed',
@@ -335,9 +936,28 @@ class SpotifyService:
                 'details': response.json()
             }), response.status_code
 
+    def _playback_response(self, response, action, user_id=None, **details):
+        """handle_response, plus a 'playback' event for the user (default: the session's) when Spotify accepted it."""
+        if user_id is None:
+            user_id = session.get('user_id')
+        if user_id and response and response.status_code in (200, 202, 204):
+            event_bus.publish(user_id, 'playback', dict(details, action=action))
+        return self.handle_response(response)
+
     # ------------------------------------------------------------------------
-    # 7. Helper for extracting album art
+    # 7. Helpers for turning Spotify track objects into rows
     # ------------------------------------------------------------------------
+    def _track_fields(self, track):
+        """Column values shared by Like and Recent rows, from a Spotify track object."""
+        return {
+            'name': track.get('name', 'Unknown'),
+            'artist': ', '.join(artist['name'] for artist in track.get('artists', [])),
+            'album': track.get('album', {}).get('name', 'Unknown Album'),
+            'albumArt': self._extract_album_art(track),
+            'uri': track.get('uri'),
+            'duration_ms': track.get('duration_ms', 0)
+        }
+
     def _extract_album_art(self, track):
         """Extracts the first album art URL from a Spotify track object (if any)."""
         images = track.get('album', {}).get('images', [])
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.spotify_service import SpotifyService
+from services.token_manager import token_manager
+
+# ------------------------------------------------------------------------
+# 0. Background Spotify Sync Worker:
+# ------------------------------------------------------------------------
+class SyncWorker:
+    """
+    Runs liked/recent syncs on a thread pool inside the web process.
+    - request_sync() is the on-demand entry point; concurrent requests for
+      the same (user, kind) share one job.
+    - A scheduler thread re-syncs every user seen recently each
+      SYNC_INTERVAL seconds, with tokens from the token manager (falling
+      back to the last access token they sent).
+    Needs no external services; each gunicorn worker runs its own pool.
+    """
+
+    KINDS = ('liked', 'recent')
+
+    def __init__(self, app=None):
+        self.app = None
+        self.spotify_service = SpotifyService()
+        self._executor = None
+        self._jobs = {}    # (user_id, kind) -> Future
+        self._tokens = {}  # user_id -> (access_token, last_seen)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SYNC_WORKERS', int(os.getenv('SYNC_WORKERS', 2)))
+        app.config.setdefault('SYNC_INTERVAL', int(os.getenv('SYNC_INTERVAL', 300)))
+        app.config.setdefault('SYNC_STALE_AFTER', int(os.getenv('SYNC_STALE_AFTER', 60)))
+        app.config.setdefault('SYNC_USER_TTL', int(os.getenv('SYNC_USER_TTL', 3600)))
+        app.config.setdefault('SYNC_FIRST_WAIT', float(os.getenv('SYNC_FIRST_WAIT', 5)))
+
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=app.config['SYNC_WORKERS'], thread_name_prefix='spotify-sync')
+        if app.config['SYNC_INTERVAL'] > 0:
+            threading.Thread(target=self._schedule_loop, name='spotify-sync-scheduler', daemon=True).start()
+
+    def request_sync(self, user_id, kind, access_token):
+        """Queue a sync of `kind` for the user unless one is already pending; returns its Future."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown sync kind: {kind}")
+        with self._lock:
+            self._tokens[user_id] = (access_token, time.monotonic())
+            return self._submit(user_id, kind, access_token)
+
+    def _submit(self, user_id, kind, access_token):
+        """Start a job for (user_id, kind) unless one is pending. Caller holds the lock."""
+        job = self._jobs.get((user_id, kind))
+        if job is None or job.done():
+            job = self._executor.submit(self._run, user_id, kind, access_token)
+            self._jobs[(user_id, kind)] = job
+        return job
+
+    def is_running(self, user_id, kind):
+        with self._lock:
+            job = self._jobs.get((user_id, kind))
+            return job is not None and not job.done()
+
+    def _run(self, user_id, kind, access_token):
+        with self.app.app_context():
+            try:
+                # Prefer the stored token, which is refreshed ahead of expiry
+                access_token = token_manager.get_access_token(user_id) or access_token
+                if kind == 'liked':
+                    result, status_code = self.spotify_service.sync_liked_tracks(user_id, access_token)
+                else:
+                    result, status_code = self.spotify_service.sync_recent_tracks(user_id, access_token)
+            except Exception as e:
+                logging.exception(f"{kind} sync failed for user {user_id}: {e}")
+                return {'error': f'{kind} sync failed'}, 500
+
+            if status_code == 401:
+                # Token expired; stop scheduling until the user comes back
+                with self._lock:
+                    self._tokens.pop(user_id, None)
+            return result, status_code
+
+    def _schedule_loop(self):
+        interval = self.app.config['SYNC_INTERVAL']
+        user_ttl = self.app.config['SYNC_USER_TTL']
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                for user_id, (_, last_seen) in list(self._tokens.items()):
+                    if now - last_seen > user_ttl:
+                        del self._tokens[user_id]
+                users = [(user_id, token) for user_id, (token, _) in self._tokens.items()]
+                for user_id, access_token in users:
+                    for kind in self.KINDS:
+                        self._submit(user_id, kind, access_token)
+
+
+sync_worker = SyncWorker()
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import session
+from sqlalchemy.orm import Session
+
+from db import db
+from models import OAuthToken
+from services.http_client import http_client
+
+SPOTIFY_TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ------------------------------------------------------------------------
+# 0. Spotify Token Manager:
+# ------------------------------------------------------------------------
+class TokenManager:
+    """
+    Hands out valid Spotify access tokens by user_id.
+    - Tokens live in the `oauth_tokens` table, so every worker, the sync
+      worker and the autoplay scheduler share them; each process caches
+      (access_token, expires_at) in memory.
+    - A token expiring within `refresh_margin` seconds is refreshed before it
+      is handed out, so Spotify calls do not run into 401s.
+    - One refresh per user at a time: a per-user lock inside the process and
+      SELECT ... FOR UPDATE on the row across processes. Whoever waits
+      re-reads the row and reuses the token the winner stored.
+    - Rotated refresh tokens returned by Spotify replace the stored one.
+    Token rows are read and written in their own short transactions, so a
+    refresh never commits or rolls back the caller's pending work.
+    """
+
+    def __init__(self, refresh_margin=120):
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._cache = {}  # user_id -> (access_token, expires_at)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def store(self, user_id, token):
+        """Save a token response from the OAuth callback (or a refresh) for the user."""
+        with Session(db.engine) as db_session:
+            row = db_session.get(OAuthToken, user_id) or OAuthToken(user_id=user_id)
+            self._apply(row, token)
+            db_session.add(row)
+            db_session.commit()
+
+    def get_access_token(self, user_id):
+        """A valid access token for the user, refreshed first if it is about to expire; None if there is none."""
+        cached = self._cache.get(user_id)
+        if cached and self._is_fresh(cached[1]):
+            return cached[0]
+
+        with self._user_lock(user_id):
+            cached = self._cache.get(user_id)
+            if cached and self._is_fresh(cached[1]):
+                return cached[0]
+            return self._load_or_refresh(user_id)
+
+    def for_session(self):
+        """The access token for the session's user, or None."""
+        user_id = session.get('user_id')
+        return self.get_access_token(user_id) if user_id else None
+
+    def expires_in(self, user_id):
+        """Seconds until the user's cached access token expires, or 0."""
+        cached = self._cache.get(user_id)
+        if not cached:
+            return 0
+        return max(0, int((cached[1] - _utcnow()).total_seconds()))
+
+    def request_refresh(self, refresh_token):
+        """Exchange a refresh token at Spotify; returns the token response dict or None."""
+        payload = {
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': os.getenv('SPOTIFY_CLIENT_ID'),
+            'client_secret': os.getenv('SPOTIFY_CLIENT_SECRET')
+        }
+        try:
+            response = http_client.post(SPOTIFY_TOKEN_URL, data=payload)
+        except Exception as e:
+            logging.error(f"Exception during token refresh: {str(e)}")
+            return None
+        if response.status_code != 200:
+            logging.error(f"Failed to refresh token. Status: {response.status_code}")
+            return None
+        logging.info("Access token refreshed successfully.")
+        return response.json()
+
+    # ------------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------------
+    def _load_or_refresh(self, user_id):
+        """Read the stored token; refresh it under the row lock if it is about to expire. Caller holds the user lock."""
+        with Session(db.engine) as db_session:
+            row = db_session.get(OAuthToken, user_id)
+            if row is None:
+                return None
+            if self._is_fresh(row.expires_at):
+                self._cache[user_id] = (row.access_token, row.expires_at)
+                return row.access_token
+
+            # Another worker may be refreshing the same row; wait for it and re-check
+            row = db_session.query(OAuthToken).filter_by(user_id=user_id).with_for_update().populate_existing().one()
+            if not self._is_fresh(row.expires_at) and row.refresh_token:
+                token = self.request_refresh(row.refresh_token)
+                if token:
+                    self._apply(row, token)
+            db_session.commit()
+
+            if row.expires_at <= _utcnow():
+                self._cache.pop(user_id, None)
+                return None
+            self._cache[user_id] = (row.access_token, row.expires_at)
+            return row.access_token
+
+    def _apply(self, row, token):
+        """Copy a token response onto the row and the cache."""
+        now = _utcnow()
+        if token.get('expires_in') is not None:
+            expires_at = now + timedelta(seconds=int(token['expires_in']))
+        elif token.get('expires_at') is not None:
+            expires_at = datetime.fromtimestamp(float(token['expires_at']), timezone.utc).replace(tzinfo=None)
+        else:
+            expires_at = now + timedelta(hours=1)
+
+        row.access_token = token['access_token']
+        if token.get('refresh_token'):
+            # Spotify may rotate the refresh token; keep the old one when it does not
+            row.refresh_token = token['refresh_token']
+        scope = token.get('scope')
+        if scope:
+            row.scope = ' '.join(scope) if isinstance(scope, (list, tuple)) else scope
+        row.expires_at = expires_at
+        row.updated_at = now
+        self._cache[row.user_id] = (row.access_token, expires_at)
+
+    def _is_fresh(self, expires_at):
+        return expires_at - _utcnow() > self.refresh_margin
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = threading.Lock()
+            return lock
+
+
+token_manager = TokenManager(refresh_margin=int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', 120)))
@@ -1,7 +1,12 @@
 from flask import session
+from sqlalchemy import delete, select
+from services.spotify_service import SpotifyService
 from models import Like, db
 
 class TrackControlService:
+    def __init__(self):
+        self.spotify_service = SpotifyService()
+
     def add_track(self, data):
         # Retrieve the user ID from the session
         user_id = session.get('user_id')  
@@ -9,18 +14,10 @@ class TrackControlService:
         if not user_id:
             return {"error": "User is not authenticated."}, 401
 
-        # Creates the liked track with the user_id
-        liked_track = Like(
-            id=data['id'],
-            name=data['name'],
-            artist=data['artist'],
-            album=data['album'],
-            albumArt=data['albumArt'],
-            user_id=user_id  
-        )
-
-        db.session.add(liked_track)
+        # Single INSERT ... ON CONFLICT DO NOTHING; liking twice is a no-op
+        self.spotify_service.like_tracks(user_id, [data])
         db.session.commit()
+        self.spotify_service.mirror_library_change([data['id']], liked=True)
         return {"message": "Track added successfully."}
 
     def remove_track(self, data):
@@ -30,17 +27,23 @@ class TrackControlService:
         if not user_id:
             return {"error": "User is not authenticated."}, 401
 
-        # Remove track for the authenticated user
-        track = Like.query.filter_by(
-            name=data['name'],
-            artist=data['artist'],
-            album=data['album'],
-            user_id=user_id  # Ensure the track belongs to the user
-        ).first()
-
-        if track:
-            db.session.delete(track)
-            db.session.commit()
+        # Remove track for the authenticated user in a single DELETE,
+        # by id when the client sends it, otherwise by name/artist/album
+        if data.get('id'):
+            match = (Like.id == data['id'],)
+        else:
+            match = (Like.name == data['name'], Like.artist == data['artist'], Like.album == data['album'])
+        stmt = delete(Like).where(Like.user_id == user_id, *match)
+
+        if db.engine.dialect.delete_returning:
+            track_ids = db.session.execute(stmt.returning(Like.id)).scalars().all()
+        else:
+            track_ids = db.session.execute(select(Like.id).where(Like.user_id == user_id, *match)).scalars().all()
+            db.session.execute(stmt)
+        db.session.commit()
+
+        if track_ids:
+            self.spotify_service.mirror_library_change(track_ids, liked=False)
             return {"message": "Track removed successfully."}
         else:
             return {"error": "Track not found."}
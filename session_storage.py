@@ -0,0 +1,247 @@
+import copy
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import CallbackDict
+
+from db import db, dialect_insert
+from models import ServerSession as ServerSessionRow
+
+SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _dumps(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+
+
+# ------------------------------------------------------------------------
+# 0. Session object handed to views:
+# ------------------------------------------------------------------------
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    A dict-like session whose contents live server-side under `sid`.
+    Changes are detected by comparing the serialized data at the end of the
+    request, so nested mutations (session['a']['b'] = ...) are saved too.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.rotate = False
+        self.loaded = _dumps(dict(self)) if initial else None
+
+    def regenerate(self):
+        """Move the data to a fresh sid at the end of the request (call after login)."""
+        self.rotate = True
+        self.modified = True
+
+
+# ------------------------------------------------------------------------
+# 1. Session Interface: SQL table + in-process read-through cache
+# ------------------------------------------------------------------------
+class ServerSessionInterface(SessionInterface):
+    """
+    Stores session data in the `server_sessions` table.
+    - Reads go through a small per-process LRU cache; entries are trusted
+      for SESSION_CACHE_TTL seconds, then re-read from the table.
+    - Writes happen only when the data changed, or at most once per
+      SESSION_REFRESH_INTERVAL to push the expiry forward.
+    - Requests for static files skip the session entirely.
+    - A background thread deletes expired rows every SESSION_SWEEP_INTERVAL.
+    """
+
+    def __init__(self, app, cache_ttl=5.0, cache_size=10000, refresh_interval=3600, sweep_interval=600):
+        self.app = app
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+        self.sweep_interval = sweep_interval
+        self._cache = OrderedDict()  # sid -> (loaded_at, data, expires_at)
+        self._lock = threading.Lock()
+
+        if sweep_interval > 0:
+            threading.Thread(target=self._sweep_loop, name='session-sweep', daemon=True).start()
+
+    def open_session(self, app, request):
+        static_path = app.static_url_path
+        if static_path and request.path.startswith(static_path + '/'):
+            return None
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SID_PATTERN.match(sid):
+            loaded = self._load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        if not isinstance(session, ServerSession):
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if not session.new:
+                self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = _utcnow()
+        expires_at = now + app.permanent_session_lifetime
+        data = dict(session)
+        changed = session.loaded != _dumps(data)
+        stale = session.expires_at is None or session.expires_at - now < app.permanent_session_lifetime - self.refresh_interval
+        if session.rotate:
+            self._delete(session.sid)
+            session.sid = self._new_sid()
+        elif not (changed or stale or session.new):
+            return
+
+        self._write(session.sid, data, expires_at)
+        response.vary.add('Cookie')
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    # ------------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------------
+    def _load(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is not None and now - entry[0] < self.cache_ttl:
+                self._cache.move_to_end(sid)
+                return copy.deepcopy(entry[1]), entry[2]
+
+        with Session(db.engine) as db_session:
+            row = db_session.get(ServerSessionRow, sid)
+            if row is None or row.expires_at <= _utcnow():
+                self._forget(sid)
+                return None
+            data, expires_at = row.data or {}, row.expires_at
+        self._remember(sid, data, expires_at)
+        return copy.deepcopy(data), expires_at
+
+    def _write(self, sid, data, expires_at):
+        row = {'sid': sid, 'data': data, 'expires_at': expires_at, 'updated_at': _utcnow()}
+        with Session(db.engine) as db_session:
+            stmt = dialect_insert(ServerSessionRow)
+            if stmt is not None:
+                stmt = stmt.values(row)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ServerSessionRow.sid],
+                    set_={
+                        'data': stmt.excluded.data,
+                        'expires_at': stmt.excluded.expires_at,
+                        'updated_at': stmt.excluded.updated_at
+                    }
+                )
+                db_session.execute(stmt)
+            else:
+                db_session.merge(ServerSessionRow(**row))
+            db_session.commit()
+        self._remember(sid, data, expires_at)
+
+    def _delete(self, sid):
+        self._forget(sid)
+        with Session(db.engine) as db_session:
+            db_session.query(ServerSessionRow).filter_by(sid=sid).delete()
+            db_session.commit()
+
+    def _remember(self, sid, data, expires_at):
+        with self._lock:
+            self._cache[sid] = (time.monotonic(), json.loads(_dumps(data)), expires_at)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _new_sid(self):
+        return secrets.token_urlsafe(32)
+
+    def sweep(self):
+        """Delete expired sessions; returns how many rows went."""
+        with self.app.app_context(), Session(db.engine) as db_session:
+            removed = db_session.query(ServerSessionRow).filter(
+                ServerSessionRow.expires_at <= _utcnow()
+            ).delete(synchronize_session=False)
+            db_session.commit()
+            return removed
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Session sweep failed: {e}")
+
+
+# ------------------------------------------------------------------------
+# 2. Flask Extension: installs the interface from app config
+# ------------------------------------------------------------------------
+class SessionStorage:
+    """
+    Configured like the other extensions (`server_sessions.init_app(app)`).
+    SESSION_STORE selects 'sql' (default) or 'cookie' (Flask's signed cookie).
+    """
+
+    def __init__(self, app=None):
+        self.interface = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_STORE', os.getenv('SESSION_STORE', 'sql'))
+        app.config.setdefault('SESSION_CACHE_TTL', float(os.getenv('SESSION_CACHE_TTL', 5)))
+        app.config.setdefault('SESSION_CACHE_SIZE', int(os.getenv('SESSION_CACHE_SIZE', 10000)))
+        app.config.setdefault('SESSION_REFRESH_INTERVAL', int(os.getenv('SESSION_REFRESH_INTERVAL', 3600)))
+        app.config.setdefault('SESSION_SWEEP_INTERVAL', int(os.getenv('SESSION_SWEEP_INTERVAL', 600)))
+
+        kind = app.config['SESSION_STORE']
+        if kind == 'cookie':
+            return
+        if kind != 'sql':
+            raise ValueError(f"Unknown SESSION_STORE: {kind}")
+        self.interface = app.session_interface = ServerSessionInterface(
+            app,
+            cache_ttl=app.config['SESSION_CACHE_TTL'],
+            cache_size=app.config['SESSION_CACHE_SIZE'],
+            refresh_interval=app.config['SESSION_REFRESH_INTERVAL'],
+            sweep_interval=app.config['SESSION_SWEEP_INTERVAL']
+        )
+
+
+server_sessions = SessionStorage()
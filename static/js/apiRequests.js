@@ -205,7 +205,7 @@ export function fetchRecentTracks() {
  ********************************************************/
 export function fetchLastPlayedTrack() {
     return $.ajax({
-        url: '/spotify/recent-tracks',
+        url: '/spotify/recent-tracks?limit=1',
         method: 'GET',
     })
     .done(function(response) {
@@ -1,4 +1,4 @@
-import { isCurrentTrack } from './utils.js';
+import { isCurrentTrack, artUrl } from './utils.js';
 
 /*********************************************************
  * Data Templating & HTML Injection of Spotify Info:
@@ -50,7 +50,7 @@ export const generateTrackHTML = (track, index) => {
     return `
         <div id="track-${index}" class="${isCurrent ? 'bg-purple-600' : 'bg-gray-800'} track-entry font-tbf bg-gray-800 hover:bg-gray-700 transition-all duration-300 ease-in-out transform hover:scale-105 opacity-1 rounded-lg shadow-md flex items-center space-x-4 py-4 px-6 my-3 mx-auto w-full sm:w-4/5 md:w-3/4 lg:w-2/3 xl:w-2/3">
             <p class="track-id text-sm text-gray-300 font-bold">${index + 1}</p>
-            <img class="w-16 h-16 rounded-lg object-cover" src="${albumArtUrl}" alt="Album Art for ${albumName}">
+            <img class="w-16 h-16 rounded-lg object-cover" src="${artUrl(albumArtUrl)}" alt="Album Art for ${albumName}">
             <div class="info flex-grow">
                 <p class="track-name text-lg text-white font-semibold">${name}</p>
                 <p class="artist-name text-sm text-gray-300">${artistNames}</p>
@@ -113,7 +113,7 @@ export const generateAlbumHTML = (album, index) => {
 
     return `
         <div id="album-${index}" class="bg-gray-800 hover:bg-gray-700 transition-all duration-300 ease-in-out transform hover:scale-105 opacity-1 rounded-lg shadow-md flex items-center space-x-4 py-4 px-6 my-3 mx-auto w-full sm:w-4/5 md:w-3/4 lg:w-2/3 xl:w-2/3">
-            <img class="w-16 h-16 rounded-lg object-cover" src="${albumArtUrl}" alt="Album Cover">
+            <img class="w-16 h-16 rounded-lg object-cover" src="${artUrl(albumArtUrl)}" alt="Album Cover">
             <div class="info flex-grow">
                 <p class="album-name text-lg text-white font-semibold">${name}</p>
                 <p class="artist-name text-md text-white">${artistNames}</p>
@@ -158,7 +158,7 @@ export const generateRecentHTML = (track, index) => {
     return `
         <div id="track-${index}" class="${isCurrent ? 'bg-purple-600' : 'bg-gray-800'} font-tbf bg-gray-800 hover:bg-gray-700 transition-all duration-300 ease-in-out transform hover:scale-105 opacity-1 rounded-lg shadow-md flex items-center space-x-4 py-4 px-6 my-3 mx-auto w-full sm:w-4/5 md:w-3/4 lg:w-2/3 xl:w-2/3">
             <p class="track-id text-sm text-gray-300 font-bold">${index + 1}</p>
-            <img class="w-16 h-16 rounded-lg object-cover" src="${albumArt}" alt="Album Art">
+            <img class="w-16 h-16 rounded-lg object-cover" src="${artUrl(albumArt)}" alt="Album Art">
             <div class="info flex-grow">
                 <p class="track-name text-lg text-white font-semibold">${name}</p>
                 <p class="artist-name text-sm text-gray-300">${artist}</p>
@@ -222,7 +222,7 @@ export const generateQueueHTML = (track, index) => {
 
     return `
         <div id="track-${index}" class="${isCurrent ? 'bg-purple-600' : 'bg-gray-800'} font-tbf hover:bg-gray-700 transition-all duration-300 ease-in-out transform hover:scale-105 opacity-1 rounded-lg shadow-md flex items-center space-x-4 py-4 px-6 my-3 mx-auto w-full sm:w-4/5 md:w-3/4 lg:w-2/3 xl:w-2/3">
-            <img class="w-16 h-16 rounded-lg object-cover" src="${albumArt || 'default_album_art.jpg'}" alt="Album Art">
+            <img class="w-16 h-16 rounded-lg object-cover" src="${artUrl(albumArt) || 'default_album_art.jpg'}" alt="Album Art">
             <div class="info flex-grow">
                 <p class="track-name text-lg text-white font-semibold">${name}</p>
                 <p class="artist-name text-sm text-gray-300">${artist}</p>
@@ -286,7 +286,7 @@ export const generateLikedTracksHTML = (track, index) => {
     return `
         <div id="track-${index}" class="${isCurrent ? 'bg-purple-600' : 'bg-gray-800'} font-tbf bg-gray-800 hover:bg-gray-700 transition-all duration-300 ease-in-out transform hover:scale-105 opacity-1 rounded-lg shadow-md flex items-center space-x-4 py-4 px-6 my-3 mx-auto w-full sm:w-4/5 md:w-3/4 lg:w-2/3 xl:w-2/3">
             <p class="track-id text-sm text-gray-300 font-bold">${index + 1}</p>
-            <img class="w-16 h-16 rounded-lg object-cover" src="${albumArt || 'default_album_art.jpg'}" alt="Album Art">
+            <img class="w-16 h-16 rounded-lg object-cover" src="${artUrl(albumArt) || 'default_album_art.jpg'}" alt="Album Art">
             <div class="info flex-grow">
                 <p class="track-name text-lg text-white font-semibold">${name}</p>
                 <p class="artist-name text-sm text-gray-300">${artist}</p>
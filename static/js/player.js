@@ -1,4 +1,5 @@
 import { updateProgressCallback, handlePlayerStateChanged } from "./playerTrack.js";
+import { setServerAdvances } from "./queueManager.js";
 
 let playerInstance = null;
 let deviceId = null;
@@ -151,8 +152,9 @@ export function playTrack(trackUri) {
         method: 'PUT',
         data: JSON.stringify(payload),
         contentType: 'application/json',
-        success: function() {
+        success: function(data, textStatus, xhr) {
             console.log('Track started playing successfully.');
+            setServerAdvances(xhr.getResponseHeader('X-Autoplay') === '1');
             const player = getPlayerInstance();
             if (player) {
                 player.getCurrentState().then(state => {
@@ -1,6 +1,6 @@
-import { nextTrack, getQueue, setCurrentTrackIndex } from './queueManager.js';
+import { nextTrack, getQueue, setCurrentTrackIndex, isServerAdvancing } from './queueManager.js';
 import { playTrack, startProgressUpdate, stopProgressUpdate, seekToPosition, getPlayerInstance } from './player.js';
-import { formatTime } from './utils.js';
+import { formatTime, artUrl } from './utils.js';
 
 /*********************************************************
  * Progress Bar Logic:
@@ -72,11 +72,14 @@ export function handlePlayerStateChanged(state) {
     // Updates the current track index in the queue
     updateCurrentTrackIndex(trackUri);
 
-    // Checks if the track has ended and move to the next track
+    // Checks if the track has ended and move to the next track, unless the
+    // server's autoplay scheduler is following it (tracks in the server queue)
     if (hasTrackEnded(state)) {
-        const nextTrackUri = nextTrack();
-        if (nextTrackUri) {
-            playTrack(nextTrackUri);
+        if (!isServerAdvancing()) {
+            const nextTrackUri = nextTrack();
+            if (nextTrackUri) {
+                playTrack(nextTrackUri);
+            }
         }
         return; // Exits the code block to avoid updating the UI with old track info
     }
@@ -124,7 +127,7 @@ function extractTrackInfo(currentTrack) {
 function updateFooter(trackInfo) {
     $('#footer-track').text(trackInfo.name);
     $('#footer-artist').text(trackInfo.artists.join(', '));
-    $('#footer-album-art').attr('src', trackInfo.albumArt);
+    $('#footer-album-art').attr('src', artUrl(trackInfo.albumArt, 300));
 }
 
 function updateProgressBar(position, duration) {
@@ -4,6 +4,8 @@
 
 let trackQueue = [];
 let currentTrackIndex = -1;
+// True while the server's autoplay scheduler follows the playing track (it is in the server queue)
+let serverAdvances = false;
 
 export function setQueue(tracks) {
     trackQueue = tracks;
@@ -53,3 +55,10 @@ export function setCurrentTrackIndex(index) {
     currentTrackIndex = index;
 };
 
+export function setServerAdvances(value) {
+    serverAdvances = value;
+};
+
+export function isServerAdvancing() {
+    return serverAdvances;
+};
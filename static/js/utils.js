@@ -24,6 +24,12 @@ export function debounce(func, delay) {
     };
 };
 
+// Route Spotify cover URLs through the /art proxy at a thumbnail size
+export function artUrl(url, size = 64) {
+    const match = /^https:\/\/i\.scdn\.co\/image\/([0-9a-f]{40})$/.exec(url || '');
+    return match ? `/art/${match[1]}?size=${size}` : url;
+};
+
 export function isCurrentTrack(id){
     const currentTrack = localStorage.getItem('currentTrack');
     // console.log(`[DEBUG]: isCurrentTrack(id) - Calling localStorage to retrieve currentTrack Data: ${currentTrack}`)
@@ -0,0 +1,304 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+
+import click
+from flask import request, send_file, url_for
+from markupsafe import Markup
+
+try:
+    from PIL import Image
+except ImportError:  # Images are fingerprinted as-is without Pillow
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Module scripts loaded by templates/index.html, in page order
+JS_ENTRIES = [
+    'js/api.js',
+    'js/utils.js',
+    'js/queueManager.js',
+    'js/player.js',
+    'js/playerTrack.js',
+    'js/apiRequests.js',
+    'js/uiUpdates.js',
+    'js/generateHTML.js'
+]
+
+# Largest size (px) an image is displayed at, doubled for high-DPI screens
+IMAGE_DISPLAY_SIZES = {
+    'images/logo.png': 320
+}
+
+COMPRESSIBLE = ('.js', '.css', '.json', '.svg', '.otf', '.ttf', '.map')
+CSS_URL_PATTERN = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+MANIFEST_NAME = 'manifest.json'
+# Precompressed siblings, in order of preference
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _fingerprint(name, data, extension=None):
+    stem, ext = os.path.splitext(name)
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f'{stem}.{digest}{extension or ext}'
+
+
+# ------------------------------------------------------------------------
+# 0. Build: fingerprint, shrink and precompress everything under static/
+# ------------------------------------------------------------------------
+class AssetBuilder:
+    """
+    Writes the built assets plus manifest.json into `out_dir`.
+    - JS: bundled and minified by esbuild when it is on the PATH; otherwise
+      each module is fingerprinted and an import map points the modules'
+      relative imports at the fingerprinted files.
+    - Images listed in IMAGE_DISPLAY_SIZES are scaled down, and PNG/JPEG
+      re-encoded as WebP, when Pillow is installed.
+    - CSS url() references are rewritten to the fingerprinted files.
+    - Text assets get .gz (and .br with the brotli package) siblings.
+    """
+
+    def __init__(self, static_dir, out_dir, url_prefix, esbuild=None):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.esbuild = esbuild
+        self.files = {}  # source name -> built name
+        self.importmap = {}
+        self.scripts = []
+
+    def build(self):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        os.makedirs(self.out_dir)
+
+        sources, stylesheets = [], []
+        for root, dirs, names in os.walk(self.static_dir):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != self.out_dir]
+            for filename in names:
+                name = os.path.relpath(os.path.join(root, filename), self.static_dir).replace(os.sep, '/')
+                (stylesheets if name.endswith('.css') else sources).append(name)
+
+        if self.esbuild:
+            self._bundle_js()
+        for name in sorted(sources):
+            if name.endswith('.js'):
+                if not self.esbuild:
+                    self._emit(name, self._read(name))
+            elif name in IMAGE_DISPLAY_SIZES or name.endswith(('.png', '.jpg', '.jpeg')):
+                self._emit_image(name)
+            else:
+                self._emit(name, self._read(name))
+        # After the files they may reference
+        for name in sorted(stylesheets):
+            self._emit(name, self._rewrite_css(name).encode())
+
+        if not self.esbuild:
+            # Hashed modules import './x.js'; map those resolved URLs to the hashed files
+            self.importmap = {
+                f'{self.url_prefix}/{name}': f'{self.url_prefix}/{built}'
+                for name, built in self.files.items() if name.endswith('.js')
+            }
+            self.scripts = [self.files[name] for name in JS_ENTRIES if name in self.files]
+
+        manifest = {'files': self.files, 'scripts': self.scripts, 'importmap': self.importmap}
+        with open(os.path.join(self.out_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest
+
+    def _bundle_js(self):
+        entry = ''.join(f"import './{os.path.relpath(name, 'js')}';\n" for name in JS_ENTRIES)
+        result = subprocess.run(
+            [self.esbuild, '--bundle', '--format=esm', '--minify', '--log-level=warning'],
+            input=entry.encode(),
+            cwd=os.path.join(self.static_dir, 'js'),
+            capture_output=True,
+            check=True
+        )
+        built = self._emit('js/app.js', result.stdout)
+        self.scripts = [built]
+
+    def _emit_image(self, name):
+        data = self._read(name)
+        if Image is None:
+            return self._emit(name, data)
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                size = IMAGE_DISPLAY_SIZES.get(name)
+                if size:
+                    image.thumbnail((size, size))
+                out = io.BytesIO()
+                image.save(out, 'WEBP', quality=82, method=6)
+        except Exception as e:
+            logging.warning(f"Could not convert {name}: {e}")
+            return self._emit(name, data)
+        return self._emit(name, out.getvalue(), extension='.webp')
+
+    def _rewrite_css(self, name):
+        css = self._read(name).decode()
+        static_prefix = self.url_prefix.rsplit('/', 1)[0] + '/'
+        base = os.path.dirname(name)
+
+        def replace(match):
+            target = match.group(2).strip()
+            if target.startswith(static_prefix):
+                ref = target[len(static_prefix):]
+            elif '://' in target or target.startswith(('data:', '/', '#')):
+                return match.group(0)
+            else:
+                ref = os.path.normpath(os.path.join(base, target)).replace(os.sep, '/')
+            built = self.files.get(ref)
+            return f"url('{self.url_prefix}/{built}')" if built else match.group(0)
+
+        return CSS_URL_PATTERN.sub(replace, css)
+
+    def _emit(self, name, data, extension=None):
+        built = _fingerprint(name, data, extension)
+        path = os.path.join(self.out_dir, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if built.endswith(COMPRESSIBLE):
+            self._precompress(path, data)
+        self.files[name] = built
+        return built
+
+    def _precompress(self, path, data):
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            # Not worth a second request path when it barely shrinks
+            if len(compressed) < len(data) * 0.9:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+    def _read(self, name):
+        with open(os.path.join(self.static_dir, name), 'rb') as f:
+            return f.read()
+
+
+# ------------------------------------------------------------------------
+# 1. Flask Extension: serves the build and resolves names in templates
+# ------------------------------------------------------------------------
+class AssetPipeline:
+    """
+    Built files are served from <static>/dist with immutable caching and
+    the precompressed variant the client accepts. `asset_url(name)` and
+    `asset_scripts()` read the manifest; before a build (local development)
+    they fall back to the plain static files.
+    Build with `flask assets build` before starting the server.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._manifest = None
+        self._manifest_mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DIR', os.getenv('ASSETS_DIR', os.path.join(app.static_folder, 'dist')))
+        app.config.setdefault('ASSETS_ESBUILD', os.getenv('ASSETS_ESBUILD') or shutil.which('esbuild'))
+        app.config.setdefault('ASSETS_MAX_AGE', int(os.getenv('ASSETS_MAX_AGE', 365 * 24 * 3600)))
+
+        self.app = app
+        app.add_url_rule(f'{app.static_url_path}/dist/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.add_template_global(self.asset_scripts, 'asset_scripts')
+        app.cli.add_command(assets_cli)
+
+    def build(self):
+        builder = AssetBuilder(
+            self.app.static_folder,
+            self.app.config['ASSETS_DIR'],
+            f'{self.app.static_url_path}/dist',
+            esbuild=self.app.config['ASSETS_ESBUILD']
+        )
+        manifest = builder.build()
+        self._manifest_mtime = None
+        return manifest
+
+    def manifest(self):
+        """The current manifest, re-read when a new build replaced it; None before any build."""
+        path = os.path.join(self.app.config['ASSETS_DIR'], MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if mtime != self._manifest_mtime:
+            with open(path) as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def asset_url(self, name):
+        manifest = self.manifest()
+        built = manifest and manifest['files'].get(name)
+        if built:
+            return url_for('assets', filename=built)
+        return url_for('static', filename=name)
+
+    def asset_scripts(self):
+        """<script> tags for JS_ENTRIES (the bundle, or the modules plus their import map)."""
+        manifest = self.manifest()
+        tags = []
+        if manifest is None:
+            srcs = [url_for('static', filename=name) for name in JS_ENTRIES]
+        else:
+            if manifest['importmap']:
+                importmap = json.dumps({'imports': manifest['importmap']}).replace('</', '<\\/')
+                tags.append(f'<script type="importmap">{importmap}</script>')
+            srcs = [url_for('assets', filename=built) for built in manifest['scripts']]
+        tags += [f'<script type="module" src="{src}"></script>' for src in srcs]
+        return Markup('\n'.join(tags))
+
+    def serve(self, filename):
+        directory = self.app.config['ASSETS_DIR']
+        path = os.path.normpath(os.path.join(directory, filename))
+        if filename == MANIFEST_NAME or not path.startswith(directory + os.sep) or not os.path.isfile(path):
+            return 'Not Found', 404
+
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate, suffix in ENCODING_SUFFIXES.items():
+            if accepted[candidate] and os.path.isfile(path + suffix):
+                encoding = candidate
+                break
+
+        response = send_file(
+            path + ENCODING_SUFFIXES[encoding] if encoding else path,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            conditional=True,
+            max_age=self.app.config['ASSETS_MAX_AGE']
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+asset_pipeline = AssetPipeline()
+
+
+@click.group('assets')
+def assets_cli():
+    """Static asset pipeline."""
+
+
+@assets_cli.command('build')
+def build_assets():
+    """Fingerprint, shrink and precompress static/ into the dist directory."""
+    manifest = asset_pipeline.build()
+    click.echo(f"Built {len(manifest['files'])} assets into {asset_pipeline.app.config['ASSETS_DIR']}")
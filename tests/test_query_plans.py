@@ -0,0 +1,114 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot library and queue lookups: each must
+be answered through the indexes added by the migrations, never by scanning
+the table. The schema is built by running the migrations, not create_all,
+so a migration that loses an index fails here.
+"""
+import os
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'plans.db')
+os.environ['QUEUE_STORE'] = 'sql'
+os.environ['SESSION_STORE'] = 'cookie'
+
+import pytest
+from flask import session
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+from app import app
+from db import db
+from models import Like
+from queue_storage import queue_store
+from services.spotify_service import SpotifyService, _encode_cursor
+from services.track_control_service import TrackControlService
+
+USER_ID = 1
+
+
+@pytest.fixture(scope='module')
+def ctx():
+    with app.app_context():
+        upgrade()
+        yield
+
+
+def query_plans(fn):
+    """Run `fn`, then EXPLAIN QUERY PLAN every SELECT it issued. Returns [(sql, [detail, ...])]."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert statements, 'no SELECT was issued'
+    connection = db.session.connection()
+    return [
+        (statement, [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)])
+        for statement, parameters in statements
+    ]
+
+
+def assert_searches(plans, table, index):
+    for statement, details in plans:
+        assert not any(detail.startswith(f'SCAN {table}') for detail in details), (statement, details)
+        assert any(detail.startswith(f'SEARCH {table} USING') and index in detail for detail in details), (statement, details)
+
+
+def test_liked_pages_use_user_added_at_index(ctx):
+    service = SpotifyService()
+    cursor = _encode_cursor(datetime(2024, 1, 1), 'track')
+    plans = query_plans(lambda: (
+        service.fetch_liked_tracks(USER_ID),
+        service.fetch_liked_tracks(USER_ID, cursor=cursor),
+        Like.query.filter_by(user_id=USER_ID, mirrored=True).count()
+    ))
+    assert len(plans) == 3
+    assert_searches(plans, 'liked_songs', 'ix_liked_songs_user_added_at (user_id=?')
+
+
+def test_recent_pages_use_user_played_at_key(ctx):
+    service = SpotifyService()
+    cursor = _encode_cursor(datetime(2024, 1, 1), None)
+    plans = query_plans(lambda: (
+        service.fetch_recent_tracks(USER_ID),
+        service.fetch_recent_tracks(USER_ID, cursor=cursor)
+    ))
+    assert len(plans) == 2
+    assert_searches(plans, 'recently_played', '(user_id=?')
+    # Newest-first straight off the (user_id, played_at) key, no sort step
+    for statement, details in plans:
+        assert not any('TEMP B-TREE' in detail for detail in details), (statement, details)
+
+
+def test_local_track_lookup_uses_user_track_indexes(ctx):
+    service = SpotifyService()
+    plans = query_plans(lambda: service._local_tracks(USER_ID, ['a', 'b', 'c']))
+    liked, recent = plans
+    assert_searches([liked], 'liked_songs', '(user_id=? AND id=?)')
+    assert_searches([recent], 'recently_played', 'ix_recently_played_user_track (user_id=? AND id=?)')
+
+
+def test_remove_by_name_uses_user_name_artist_album_index(ctx):
+    service = TrackControlService()
+    body = {'name': 'Song', 'artist': 'Artist', 'album': 'Album'}
+    # The SELECT path taken when the database has no DELETE ... RETURNING
+    with app.test_request_context(), mock.patch.object(db.engine.dialect, 'delete_returning', False):
+        session['user_id'] = USER_ID
+        plans = query_plans(lambda: service.remove_track(body))
+    assert len(plans) == 1
+    assert_searches(plans, 'liked_songs', 'ix_liked_songs_user_name_artist_album (user_id=? AND name=? AND artist=? AND album=?)')
+
+
+def test_queue_state_lookups_use_primary_key(ctx):
+    plans = query_plans(lambda: (queue_store.load(USER_ID), queue_store.version(USER_ID)))
+    assert len(plans) == 2
+    assert_searches(plans, 'queue_states', 'PRIMARY KEY')
@@ -0,0 +1,96 @@
+"""
+Compare-and-swap behaviour of queue saves: QueueRegistry.mutate() retrying
+when another worker saved first, and the SQL store's write-behind buffer
+repeating the check when it flushes.
+"""
+import pytest
+from flask import Flask
+
+from db import db
+from queue_manager import QueueConflictError, QueueRegistry
+from queue_storage import MemoryQueueStore, SQLQueueStore
+
+USER_ID = 1
+
+
+def queued_ids(state):
+    return [track['id'] for track in state['queue']]
+
+
+def test_mutate_reapplies_change_after_another_writer_saves():
+    store = MemoryQueueStore()
+    ours = QueueRegistry(store=store)
+    theirs = QueueRegistry(store=store)
+    ours.mutate(USER_ID, lambda queue: queue.add_to_queue([{'id': 'a'}]))
+
+    attempts = []
+
+    def add_c(queue):
+        if not attempts:
+            # The other worker saves version 2 while we are applying ours on version 1
+            theirs.mutate(USER_ID, lambda other: other.add_to_queue([{'id': 'b'}]))
+        attempts.append(queue.version)
+        return queue.add_to_queue([{'id': 'c'}])
+
+    added = ours.mutate(USER_ID, add_c)
+
+    assert attempts == [1, 2]
+    assert [track.id for track in added] == ['c']
+    stored = store.load(USER_ID)
+    assert stored['version'] == 3
+    assert queued_ids(stored) == ['a', 'b', 'c']
+    assert ours.get(USER_ID).version == 3
+
+
+def test_mutate_gives_up_after_max_attempts():
+    class LosingStore(MemoryQueueStore):
+        def save(self, user_id, state, expected_version):
+            return False
+
+    registry = QueueRegistry(store=LosingStore(), max_attempts=3)
+    calls = []
+
+    with pytest.raises(QueueConflictError):
+        registry.mutate(USER_ID, lambda queue: calls.append(queue.add_to_queue([{'id': 'a'}])))
+    assert len(calls) == 3
+
+
+@pytest.fixture
+def sql_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_sql_store_coalesces_saves_until_flush(sql_app):
+    store = SQLQueueStore(sql_app, flush_interval=3600)
+    for version in (1, 2, 3):
+        state = {'queue': [{'id': str(n)} for n in range(version)], 'current_index': 0, 'version': version}
+        assert store.save(USER_ID, state, version - 1)
+    assert not store.save(USER_ID, dict(state, version=4), 1)
+
+    assert store.version(USER_ID) == 3
+    assert store._stored_version(USER_ID) is None
+    store.flush()
+    assert store._stored_version(USER_ID) == 3
+    assert store.load(USER_ID)['version'] == 3
+
+
+def test_sql_flush_drops_snapshot_that_lost_the_race(sql_app):
+    conflicts = []
+    ours = SQLQueueStore(sql_app, flush_interval=3600, on_conflict=conflicts.append)
+    theirs = SQLQueueStore(sql_app, flush_interval=3600)
+    assert ours.save(USER_ID, {'queue': [{'id': 'a'}], 'current_index': 0, 'version': 1}, 0)
+    ours.flush()
+
+    # Both workers buffer a version 2 against stored version 1; theirs flushes first
+    assert ours.save(USER_ID, {'queue': [{'id': 'a'}, {'id': 'ours'}], 'current_index': 0, 'version': 2}, 1)
+    assert theirs.save(USER_ID, {'queue': [{'id': 'a'}, {'id': 'theirs'}], 'current_index': 0, 'version': 2}, 1)
+    theirs.flush()
+    ours.flush()
+
+    assert conflicts == [USER_ID]
+    assert queued_ids(ours.load(USER_ID)) == ['a', 'theirs']